@@ -5,12 +5,22 @@
 # GitHub: github.com/esc9822/expensestracker
 # ============================================================
 
-from flask import Flask, render_template, request, redirect, send_file, session, flash
+from flask import Flask, render_template, request, redirect, send_file, session, flash, Response, jsonify
 import csv
+import zlib
 from datetime import datetime
+from io import StringIO
 import database as db
 from functools import wraps
+import columnar_export
 import config
+import group_commit
+import importer
+import math
+import metrics
+import multiprocessing
+import pdf_jobs
+import slow_queries
 import os
 import uuid
 
@@ -18,8 +28,24 @@ app = Flask(__name__)
 # Use environment variable for production, fallback for development
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-key-change-in-production')
 
-db.init_db()
-success, message = config.fetch_live_rates()
+def startup():
+    """Prepare the serving process: hooks, schema check and the rate refresher"""
+    # Opt-in instrumentation (METRICS_ENABLED=1, SLOW_QUERY_MS=<threshold>); both
+    # must hook in before the first connection
+    metrics.install(app)
+    slow_queries.install()
+    # Opt-in group commit of route writes (GROUP_COMMIT_MS=<window>)
+    group_commit.install()
+    
+    # A single PRAGMA read when the schema is already current
+    db.init_db()
+    config.start_rate_refresher()
+
+# pdf_jobs' spawned render processes re-import the main script, which is this
+# file under `python app.py` (or a script importing it). They only render PDFs,
+# so skip the server's startup there, rate refresher thread included.
+if multiprocessing.current_process().name == 'MainProcess':
+    startup()
 
 def get_user_id():
     """Get or create a unique user_id for this browser/device"""
@@ -41,18 +67,30 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def is_admin():
+    """Whether the session may use admin-only actions (always, in PERSONAL mode)"""
+    return config.MODE == 'PERSONAL' or ('user' in session and session['user']['role'] == 'admin')
+
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if config.MODE == 'PERSONAL':
-            return f(*args, **kwargs)
-        
-        if 'user' not in session or session['user']['role'] != 'admin':
+        if not is_admin():
             flash('Admin access required!')
             return redirect('/')
         return f(*args, **kwargs)
     return decorated_function
 
+def api_login_required(f):
+    """Like login_required, but answers API clients with 401 JSON instead of a redirect"""
+    view = login_required(f)
+    
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if config.MODE != 'PERSONAL' and 'user' not in session:
+            return jsonify({'error': 'Login required'}), 401
+        return view(*args, **kwargs)
+    return decorated_function
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if config.MODE == 'PERSONAL':
@@ -96,72 +134,73 @@ def refresh_rates():
 def get_current_country():
     return session.get('country', config.DEFAULT_COUNTRY)
 
+def form_amount(field):
+    """Read an amount from the posted form; None unless it is a finite number"""
+    try:
+        amount = float(request.form[field])
+    except ValueError:
+        return None
+    # float() accepts 'inf' and 'nan', which cannot be stored as centavos
+    return amount if math.isfinite(amount) else None
+
 @app.route("/", methods=["GET", "POST"])
 @login_required
 def home():
     if request.method == "POST":
         date = request.form["date"]
         name = request.form["name"]
-        amount = float(request.form["amount"])
+        amount = form_amount("amount")
+        if amount is None:
+            flash('Amount must be a number')
+            return redirect("/")
         category = request.form["category"]
         due_date = request.form.get("due_date", "")
         
-        # Convert amount to base currency (PHP) before saving
+        # Convert amount to base currency (PHP) centavos before saving
         current_country = get_current_country()
         country_info = config.get_country_info(current_country)
-        amount_in_base = config.convert_to_base(amount, country_info['currency'])
+        amount_in_base = config.to_minor(config.convert_to_base(amount, country_info['currency']))
         
         user_id = get_user_id()
         db.add_expense(date, name, amount_in_base, category, due_date, user_id)
         return redirect("/")
-
-    # Get pagination parameters
+    
+    # Get pagination parameters (after/before are keyset cursors from the next/prev links)
     page = request.args.get('page', 1, type=int)
+    after = request.args.get('after', '', type=str)
+    before = request.args.get('before', '', type=str)
     search = request.args.get('search', '', type=str)
     category_filter = request.args.get('category', '', type=str)
     
-    user_id = get_user_id()
-    expenses, total = db.get_all_expenses(page=page, search=search, category=category_filter, user_id=user_id)
-    
-    # Get current country and currency info
+    # Get current country and currency info (1 PHP = conversion_rate selected currency)
     current_country = get_current_country()
     country_info = config.get_country_info(current_country)
+    conversion_rate = config.get_rate(country_info['currency'])
     
-    # Convert all expense amounts from base currency to selected currency
-    converted_expenses = []
-    for expense in expenses:
-        # Convert to tuple format for template compatibility (id, date, name, amount, category, due_date)
-        converted_expense = (
-            expense['id'],
-            expense['date'],
-            expense['name'],
-            config.convert_from_base(expense['amount'], country_info['currency']),
-            expense['category'],
-            expense['due_date'] if 'due_date' in expense.keys() else ''
-        )
-        converted_expenses.append(converted_expense)
+    # Amounts come back already converted to the selected currency; rows index like
+    # the (id, date, name, amount, category, due_date) tuples the template expects
+    user_id = get_user_id()
+    expenses, total = db.get_all_expenses(page=page, search=search, category=category_filter, user_id=user_id,
+                                          after=after, before=before, rate=conversion_rate)
+    next_cursor = db.encode_cursor(expenses[-1]) if expenses else ''
+    prev_cursor = db.encode_cursor(expenses[0]) if expenses else ''
     
     # Calculate pagination
     per_page = 50
     total_pages = (total + per_page - 1) // per_page
     
     # Get budget status and convert
-    budget_status = db.get_budget_status(user_id=user_id)
-    if budget_status:
-        budget_status['budget'] = config.convert_from_base(budget_status['budget'], country_info['currency'])
-        budget_status['spent'] = config.convert_from_base(budget_status['spent'], country_info['currency'])
-        budget_status['remaining'] = config.convert_from_base(budget_status['remaining'], country_info['currency'])
-    
-    # Get conversion rate (1 PHP = X selected currency)
-    conversion_rate = config.CONVERSION_RATES.get(country_info['currency'], 1.0)
+    budget_status = config.convert_budget_status(db.get_budget_status(user_id=user_id), conversion_rate)
     
     # Get last update time for rates
-    cached_rates, last_update = db.get_currency_rates()
+    last_update = config.rates_updated_at()
     
     return render_template("index.html", 
-                         expenses=converted_expenses, 
+                         expenses=expenses, 
                          page=page, 
                          total_pages=total_pages,
+                         next_cursor=next_cursor,
+                         prev_cursor=prev_cursor,
                          search=search,
                          category_filter=category_filter,
                          total_count=total,
@@ -183,6 +222,18 @@ def delete(index):
     db.delete_expense(index, user_id)
     return redirect("/")
 
+@app.route("/admin/slow_queries", methods=["GET", "DELETE"])
+@login_required
+@admin_required
+def admin_slow_queries():
+    """Slow SQL statements recorded by this worker as JSON; DELETE clears them"""
+    if not slow_queries.enabled():
+        return jsonify({'error': 'Slow-query log is off; set SLOW_QUERY_MS to enable it'}), 404
+    if request.method == 'DELETE':
+        slow_queries.reset()
+        return jsonify({'cleared': True})
+    return jsonify(slow_queries.report())
+
 @app.route("/delete_all_expenses")
 @login_required
 @admin_required
@@ -196,7 +247,10 @@ def delete_all_expenses():
 @login_required
 @admin_required
 def set_budget():
-    amount = float(request.form["budget_amount"])
+    amount = form_amount("budget_amount")
+    if amount is None:
+        flash('Budget amount must be a number')
+        return redirect("/")
     month = request.form.get("budget_month", "")
     
     if not month:
@@ -205,7 +259,7 @@ def set_budget():
     
     current_country = get_current_country()
     country_info = config.get_country_info(current_country)
-    amount_in_base = config.convert_to_base(amount, country_info['currency'])
+    amount_in_base = config.to_minor(config.convert_to_base(amount, country_info['currency']))
     
     user_id = get_user_id()
     db.set_budget(amount_in_base, month, user_id)
@@ -226,19 +280,22 @@ def edit(index):
     if request.method == "POST":
         date = request.form["date"]
         name = request.form["name"]
-        amount = float(request.form["amount"])
+        amount = form_amount("amount")
+        if amount is None:
+            flash('Amount must be a number')
+            return redirect("/")
         category = request.form["category"]
         due_date = request.form.get("due_date", "")
         
-        # Convert amount to base currency before saving
+        # Convert amount to base currency centavos before saving
         current_country = get_current_country()
         country_info = config.get_country_info(current_country)
-        amount_in_base = config.convert_to_base(amount, country_info['currency'])
+        amount_in_base = config.to_minor(config.convert_to_base(amount, country_info['currency']))
         
         user_id = get_user_id()
         db.update_expense(index, date, name, amount_in_base, category, due_date, user_id)
         return redirect("/")
-
+    
     expense = db.get_expense_by_id(index, get_user_id())
     if expense:
         current_country = get_current_country()
@@ -246,9 +303,9 @@ def edit(index):
         
         # Convert amount from base currency to selected currency
         expense_dict = dict(expense)
-        expense_dict['amount'] = config.convert_from_base(expense['amount'], country_info['currency'])
+        expense_dict['amount'] = round(config.convert_from_base(config.from_minor(expense['amount']), country_info['currency']), 2)
         
-        conversion_rate = config.CONVERSION_RATES.get(country_info['currency'], 1.0)
+        conversion_rate = config.get_rate(country_info['currency'])
         
         return render_template("edit.html", expense=expense_dict, index=index, 
                              country=current_country,
@@ -259,48 +316,130 @@ def edit(index):
     
     return redirect("/")
 
+@app.route("/import", methods=["POST"])
+@login_required
+def import_expenses():
+    """Bulk import expenses from an uploaded CSV or JSON lines file"""
+    upload = request.files.get('file')
+    wants_json = request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json'
+    if not upload or not upload.filename:
+        if wants_json:
+            return jsonify({'error': 'No file uploaded'}), 400
+        flash('Choose a CSV or JSON lines file to import')
+        return redirect('/')
+    
+    # Amounts in the file are in the selected currency, like the add-expense form
+    country_info = config.get_country_info(get_current_country())
+    to_base = 1 / config.get_rate(country_info['currency'])
+    
+    try:
+        result = importer.import_upload(upload, user_id=get_user_id(), to_base=to_base,
+                                        atomic=request.form.get('atomic') == '1')
+    except (UnicodeDecodeError, csv.Error) as e:
+        if wants_json:
+            return jsonify({'error': f'Unreadable file: {e}'}), 400
+        flash(f'Unreadable file: {e}')
+        return redirect('/')
+    
+    if wants_json:
+        result['errors'] = [{'line': line_num, 'error': error} for line_num, error in result['errors']]
+        return jsonify(result), 200 if result['imported'] or not result['skipped'] else 400
+    flash(importer.summarize(result))
+    return redirect('/')
+
+# Largest batch /api/expenses accepts in one request
+API_MAX_OPERATIONS = 1000
+
+def parse_api_operation(operation, to_base):
+    """Validate one /api/expenses operation into (op, expense_id, fields); raise ValueError if it is bad"""
+    if not isinstance(operation, dict):
+        raise ValueError('expected an object')
+    op = operation.get('op')
+    if op not in ('create', 'update', 'delete'):
+        raise ValueError("op must be 'create', 'update' or 'delete'")
+    # JSON amounts are numbers; the importer's string parsing is for CSV cells
+    amount = operation.get('amount')
+    if 'amount' in operation and (not isinstance(amount, (int, float)) or isinstance(amount, bool)):
+        raise ValueError('amount must be a number')
+    if op == 'create':
+        return op, None, importer.clean_record(operation, to_base)
+    
+    expense_id = operation.get('id')
+    if not isinstance(expense_id, int) or isinstance(expense_id, bool):
+        raise ValueError('id must be an integer')
+    if op == 'delete':
+        return op, expense_id, {}
+    
+    fields = importer.clean_record(operation, to_base, partial=True)
+    if not fields:
+        raise ValueError('update has no fields to change')
+    return op, expense_id, fields
+
+@app.route("/api/expenses", methods=["POST"])
+@api_login_required
+def api_expenses():
+    """Apply a batch of create/update/delete operations in one transaction
+    
+    Body: {"currency": "PHP", "operations": [{"op": "create", "date": ..., "name": ...,
+    "amount": ..., "category": ...}, {"op": "update", "id": 7, "amount": 12.5},
+    {"op": "delete", "id": 8}]}, or just the list of operations. Amounts are in
+    the given currency (default PHP). If any operation is invalid, none is applied.
+    Deletes need admin access, like /delete/<id>.
+    """
+    payload = request.get_json(silent=True)
+    operations = payload.get('operations') if isinstance(payload, dict) else payload
+    if not isinstance(operations, list):
+        return jsonify({'error': 'Expected a list of operations'}), 400
+    if len(operations) > API_MAX_OPERATIONS:
+        return jsonify({'error': f'At most {API_MAX_OPERATIONS} operations per request'}), 413
+    
+    currency = payload.get('currency', 'PHP') if isinstance(payload, dict) else 'PHP'
+    if not isinstance(currency, str) or currency not in config.FALLBACK_CONVERSION_RATES:
+        return jsonify({'error': f'Unknown currency {currency!r}'}), 400
+    to_base = 1 / config.get_rate(currency)
+    
+    parsed, errors = [], []
+    for index, operation in enumerate(operations):
+        try:
+            parsed.append(parse_api_operation(operation, to_base))
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+    if errors:
+        return jsonify({'applied': 0, 'errors': errors}), 400
+    if not is_admin():
+        denied = [{'index': index, 'error': 'Admin access required to delete'}
+                  for index, (op, _, _) in enumerate(parsed) if op == 'delete']
+        if denied:
+            return jsonify({'applied': 0, 'errors': denied}), 403
+    
+    results = db.apply_expense_operations(parsed, get_user_id())
+    return jsonify({'applied': len(results), 'results': results})
+
 @app.route("/report")
 @login_required
 def report():
     user_id = get_user_id()
-    data = db.get_report_data(user_id)
+    data = db.get_report_summary(user_id)
     budget_status = db.get_budget_status(user_id=user_id)
     
     current_country = get_current_country()
     country_info = config.get_country_info(current_country)
+    conversion_rate = config.get_rate(country_info['currency'])
     
     # Convert all amounts from base currency to selected currency
-    converted_total = config.convert_from_base(data['total'], country_info['currency'])
-    
-    converted_category_totals = {}
-    for category, amount in data['category_totals'].items():
-        converted_category_totals[category] = config.convert_from_base(amount, country_info['currency'])
-    
-    converted_monthly_totals = {}
-    for month, amount in data['monthly_totals'].items():
-        converted_monthly_totals[month] = config.convert_from_base(amount, country_info['currency'])
-    
-    converted_expenses = []
-    for expense in data['all_expenses']:
-        expense_dict = dict(expense)
-        expense_dict['amount'] = config.convert_from_base(expense['amount'], country_info['currency'])
-        converted_expenses.append(expense_dict)
-    
-    if budget_status:
-        budget_status['budget'] = config.convert_from_base(budget_status['budget'], country_info['currency'])
-        budget_status['spent'] = config.convert_from_base(budget_status['spent'], country_info['currency'])
-        budget_status['remaining'] = config.convert_from_base(budget_status['remaining'], country_info['currency'])
-    
-    conversion_rate = config.CONVERSION_RATES.get(country_info['currency'], 1.0)
+    converted_total = config.from_minor(data['total']) * conversion_rate
+    converted_category_totals = config.convert_totals(data['category_totals'], conversion_rate)
+    converted_monthly_totals = config.convert_totals(data['monthly_totals'], conversion_rate)
+    budget_status = config.convert_budget_status(budget_status, conversion_rate)
     
     # Get last update time for rates
-    cached_rates, last_update = db.get_currency_rates()
+    last_update = config.rates_updated_at()
     
     return render_template("report.html", 
                          total=converted_total, 
                          category_totals=converted_category_totals,
                          monthly_totals=converted_monthly_totals,
-                         expenses=converted_expenses,
+                         total_count=data['count'],
                          budget_status=budget_status,
                          user=session['user'],
                          mode=config.MODE,
@@ -311,299 +450,191 @@ def report():
                          conversion_rate=conversion_rate,
                          rates_last_update=last_update)
 
+# Rows are flushed to the client whenever this much CSV text has been buffered
+CSV_CHUNK_SIZE = 64 * 1024
+
+def stream_csv(rows, compress=False):
+    """Encode an iterable of CSV rows as a stream of byte chunks, optionally gzipped"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    # wbits=31 writes a gzip header/trailer instead of a raw zlib stream
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    
+    def drain():
+        chunk = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(chunk) if compressor else chunk
+    
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CSV_CHUNK_SIZE:
+            yield drain()
+    
+    yield drain()
+    if compressor:
+        yield compressor.flush()
+
 @app.route("/download")
 @login_required
 def download_csv():
-    import io
-    from io import StringIO
-    
-    user_id = get_user_id()
-    data = db.get_report_data(user_id)
-    expenses = data['all_expenses']
-    total = data['total']
-    category_totals = data['category_totals']
-    monthly_totals = data['monthly_totals']
-    budget_status = db.get_budget_status(user_id=user_id)
-    
     current_country = get_current_country()
     country_info = config.get_country_info(current_country)
     currency_symbol = country_info['symbol']
+    conversion_rate = config.get_rate(country_info['currency'])
+    compress = request.args.get('gzip', '') == '1'
     
-    # Create comprehensive CSV in memory
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Write budget section
-    writer.writerow(['MONTHLY BUDGET STATUS'])
-    writer.writerow(['Country', current_country])
-    writer.writerow(['Currency', country_info['currency']])
-    writer.writerow(['Month', budget_status['month']])
-    writer.writerow(['Budget Amount', f'{currency_symbol}{budget_status["budget"]:.2f}'])
-    writer.writerow(['Total Spent', f'{currency_symbol}{budget_status["spent"]:.2f}'])
-    writer.writerow(['Remaining', f'{currency_symbol}{budget_status["remaining"]:.2f}'])
-    writer.writerow(['Percentage Used', f'{budget_status["percentage"]:.1f}%'])
-    if budget_status['remaining'] < 0:
-        writer.writerow(['Status', f'OVER BUDGET by {currency_symbol}{abs(budget_status["remaining"]):.2f}'])
-    elif budget_status['percentage'] > 80:
-        writer.writerow(['Status', f'WARNING: {budget_status["percentage"]:.1f}% used'])
-    else:
-        writer.writerow(['Status', 'On Track'])
-    
-    # Write expenses section
-    writer.writerow([])
-    writer.writerow(['EXPENSE DETAILS'])
-    writer.writerow(['Date', 'Expense Name', 'Amount', 'Category', 'Due Date'])
-    for expense in expenses:
-        writer.writerow(expense)
-    
-    # Write summary section
-    writer.writerow([])
-    writer.writerow(['SUMMARY'])
-    writer.writerow(['Total Expenses', f'{currency_symbol}{total:.2f}'])
-    writer.writerow(['Total Transactions', len(expenses)])
-    
-    # Write category breakdown
-    writer.writerow([])
-    writer.writerow(['CATEGORY BREAKDOWN'])
-    writer.writerow(['Category', 'Amount', 'Percentage'])
-    for category, amount in sorted(category_totals.items(), key=lambda x: x[1], reverse=True):
-        percentage = (amount / total * 100) if total > 0 else 0
-        writer.writerow([category, f'{currency_symbol}{amount:.2f}', f'{percentage:.1f}%'])
-    
-    # Write monthly breakdown
-    writer.writerow([])
-    writer.writerow(['MONTHLY BREAKDOWN'])
-    writer.writerow(['Month', 'Amount'])
-    for month in sorted(monthly_totals.keys(), reverse=True):
-        writer.writerow([month, f'{currency_symbol}{monthly_totals[month]:.2f}'])
-    
-    # Convert to bytes for download
-    output.seek(0)
+    # Every amount in the export is in the selected currency
+    user_id = get_user_id()
+    data = db.get_report_summary(user_id)
+    total = config.from_minor(data['total']) * conversion_rate
+    category_totals = config.convert_totals(data['category_totals'], conversion_rate)
+    monthly_totals = config.convert_totals(data['monthly_totals'], conversion_rate)
+    budget_status = config.convert_budget_status(db.get_budget_status(user_id=user_id), conversion_rate)
+    
+    def report_rows():
+        # Write budget section
+        yield ['MONTHLY BUDGET STATUS']
+        yield ['Country', current_country]
+        yield ['Currency', country_info['currency']]
+        yield ['Month', budget_status['month']]
+        yield ['Budget Amount', f'{currency_symbol}{budget_status["budget"]:.2f}']
+        yield ['Total Spent', f'{currency_symbol}{budget_status["spent"]:.2f}']
+        yield ['Remaining', f'{currency_symbol}{budget_status["remaining"]:.2f}']
+        yield ['Percentage Used', f'{budget_status["percentage"]:.1f}%']
+        if budget_status['remaining'] < 0:
+            yield ['Status', f'OVER BUDGET by {currency_symbol}{abs(budget_status["remaining"]):.2f}']
+        elif budget_status['percentage'] > 80:
+            yield ['Status', f'WARNING: {budget_status["percentage"]:.1f}% used']
+        else:
+            yield ['Status', 'On Track']
+        
+        # Write expenses section, straight from the database cursor
+        yield []
+        yield ['EXPENSE DETAILS']
+        yield ['Date', 'Expense Name', 'Amount', 'Category', 'Due Date']
+        yield from db.iter_report_expenses(user_id, rate=conversion_rate)
+        
+        # Write summary section
+        yield []
+        yield ['SUMMARY']
+        yield ['Total Expenses', f'{currency_symbol}{total:.2f}']
+        yield ['Total Transactions', data['count']]
+        
+        # Write category breakdown
+        yield []
+        yield ['CATEGORY BREAKDOWN']
+        yield ['Category', 'Amount', 'Percentage']
+        for category, amount in sorted(category_totals.items(), key=lambda x: x[1], reverse=True):
+            percentage = (amount / total * 100) if total > 0 else 0
+            yield [category, f'{currency_symbol}{amount:.2f}', f'{percentage:.1f}%']
+        
+        # Write monthly breakdown
+        yield []
+        yield ['MONTHLY BREAKDOWN']
+        yield ['Month', 'Amount']
+        for month in sorted(monthly_totals.keys(), reverse=True):
+            yield [month, f'{currency_symbol}{monthly_totals[month]:.2f}']
+    
+    filename = f'expenses_report_{datetime.now().strftime("%Y%m%d")}.csv'
+    if compress:
+        filename += '.gz'
+    
+    return Response(
+        stream_csv(report_rows(), compress),
+        mimetype='application/gzip' if compress else 'text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@app.route("/download_parquet", defaults={'fmt': 'parquet'})
+@app.route("/download_arrow", defaults={'fmt': 'arrow'})
+@login_required
+def download_columnar(fmt):
+    """Typed export of every expense for data tools; amounts in PHP, not the selected currency"""
+    if not columnar_export.available():
+        return jsonify({'error': 'Parquet and Arrow exports need pyarrow (pip install pyarrow)'}), 501
+    
+    mimetype, extension = columnar_export.FORMATS[fmt]
+    filename = f'expenses_{datetime.now().strftime("%Y%m%d")}{extension}'
+    return Response(
+        columnar_export.stream_export(get_user_id(), fmt),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+def pdf_job_payload(job_id):
+    """JSON description of a background PDF job"""
+    status = pdf_jobs.get_status(job_id)
+    payload = {
+        'job_id': job_id,
+        'status': status,
+        'status_url': f'/download_pdf/status/{job_id}',
+    }
+    if status == 'done':
+        payload['result_url'] = f'/download_pdf/result/{job_id}'
+    elif status == 'failed':
+        payload['error'] = pdf_jobs.get_error(job_id)
+    return payload
+
+def send_pdf(job_id):
+    kind = 'statement' if pdf_jobs.is_statement(job_id) else 'report'
     return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
+        pdf_jobs.result_path(job_id),
+        mimetype='application/pdf',
         as_attachment=True,
-        download_name=f'expenses_report_{datetime.now().strftime("%Y%m%d")}.csv'
+        download_name=f'expense_{kind}_{datetime.now().strftime("%Y%m%d")}.pdf'
     )
 
 @app.route('/download_pdf')
 @login_required
 def download_pdf():
-    """Generate and download PDF report with visualizations"""
-    try:
-        # Workaround for PIL DLL issues - mock PIL if it fails to load
-        import sys
-        try:
-            from PIL import Image
-        except (ImportError, OSError) as pil_error:
-            # Create a mock PIL module to allow reportlab to import
-            print(f"PIL import failed: {pil_error}, using mock")
-            from unittest.mock import MagicMock
-            sys.modules['PIL'] = MagicMock()
-            sys.modules['PIL.Image'] = MagicMock()
-        
-        # Import reportlab components
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import letter
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-        import io
-    except ImportError as e:
-        print(f"Import error in PDF export: {e}")
-        flash(f'PDF export requires additional libraries. Error: {str(e)}')
+    """Download the PDF report, rendering it in the background if it is not cached yet
+    
+    ?full=1 asks for the complete statement with every expense instead of the
+    50 most recent.
+    """
+    user_id = get_user_id()
+    country_info = config.get_country_info(get_current_country())
+    currency = country_info['currency']
+    conversion_rate = config.get_rate(currency)
+    full = request.args.get('full') == '1'
+    
+    job_id = pdf_jobs.job_id_for(user_id, currency, conversion_rate,
+                                 db.get_data_version(user_id), datetime.now().strftime('%Y-%m'), full)
+    status = pdf_jobs.submit(job_id, user_id, currency, country_info['symbol'], conversion_rate)
+    
+    if status == 'done':
+        return send_pdf(job_id)
+    
+    # Scripted clients poll the status URL; browsers get a page that does it for them
+    if request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json':
+        return jsonify(pdf_job_payload(job_id)), 202
+    return render_template('pdf_status.html', job_id=job_id)
+
+@app.route('/download_pdf/status/<job_id>')
+@login_required
+def download_pdf_status(job_id):
+    if not pdf_jobs.owns_job(get_user_id(), job_id):
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(pdf_job_payload(job_id))
+
+@app.route('/download_pdf/result/<job_id>')
+@login_required
+def download_pdf_result(job_id):
+    if not pdf_jobs.owns_job(get_user_id(), job_id):
         return redirect('/report')
     
-    try:
-        # Get country and currency
-        country = session.get('country', config.DEFAULT_COUNTRY)
-        country_info = config.get_country_info(country)
-        currency = country_info['currency']
-        currency_symbol = country_info['symbol']
-        conversion_rate = config.CONVERSION_RATES.get(currency, 1.0)
-        
-        # Get report data
-        user_id = get_user_id()
-        report_data = db.get_report_data(user_id)
-        
-        # Convert amounts for current currency
-        total = report_data['total'] * conversion_rate
-        
-        category_totals = {}
-        for category, amount in report_data['category_totals'].items():
-            category_totals[category] = amount * conversion_rate
-        
-        monthly_totals = {}
-        for month, amount in report_data['monthly_totals'].items():
-            monthly_totals[month] = amount * conversion_rate
-        
-        # Convert expense amounts
-        expenses = []
-        for exp in report_data['all_expenses']:
-            expenses.append({
-                'date': exp[0],
-                'name': exp[1],
-                'amount': exp[2] * conversion_rate,
-                'category': exp[3],
-                'due_date': exp[4] if len(exp) > 4 else ''
-            })
-        
-        # Get budget status
-        budget_status = db.get_budget_status(user_id=user_id)
-        if budget_status and currency != config.DEFAULT_CURRENCY:
-            budget_status['budget'] *= conversion_rate
-            budget_status['spent'] *= conversion_rate
-            budget_status['remaining'] *= conversion_rate
-        
-        # Create PDF
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72,
-                              topMargin=72, bottomMargin=18)
-        
-        # Container for elements
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#667eea'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#764ba2'),
-            spaceAfter=12,
-        )
-        
-        # Title
-        elements.append(Paragraph("Expense Tracker Report", title_style))
-        elements.append(Paragraph(f"Generated: {datetime.now().strftime('%B %d, %Y %I:%M %p')}", styles['Normal']))
-        elements.append(Paragraph(f"Currency: {currency_symbol} {currency}", styles['Normal']))
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Summary Section
-        elements.append(Paragraph("Summary", heading_style))
-        summary_data = [
-            ['Total Expenses:', f'{currency_symbol}{total:.2f}'],
-            ['Total Transactions:', str(len(expenses))],
-            ['Categories:', str(len(category_totals))],
-        ]
-        
-        if budget_status:
-            summary_data.extend([
-                ['Monthly Budget:', f'{currency_symbol}{budget_status["budget"]:.2f}'],
-                ['Budget Used:', f'{budget_status["percentage"]:.1f}%'],
-                ['Remaining:', f'{currency_symbol}{budget_status["remaining"]:.2f}'],
-            ])
-        
-        summary_table = Table(summary_data, colWidths=[3*inch, 3*inch])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f8f9fa')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ]))
-        elements.append(summary_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Category Breakdown
-        elements.append(Paragraph("Category Breakdown", heading_style))
-        category_data = [['Category', 'Amount', 'Percentage']]
-        for category, amount in sorted(category_totals.items(), key=lambda x: x[1], reverse=True):
-            percentage = (amount / total * 100) if total > 0 else 0
-            category_data.append([category, f'{currency_symbol}{amount:.2f}', f'{percentage:.1f}%'])
-        
-        category_table = Table(category_data, colWidths=[2*inch, 2*inch, 2*inch])
-        category_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        elements.append(category_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Monthly Breakdown
-        elements.append(Paragraph("Monthly Breakdown", heading_style))
-        monthly_data = [['Month', 'Amount']]
-        for month in sorted(monthly_totals.keys(), reverse=True):
-            monthly_data.append([month, f'{currency_symbol}{monthly_totals[month]:.2f}'])
-        
-        monthly_table = Table(monthly_data, colWidths=[3*inch, 3*inch])
-        monthly_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#764ba2')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        elements.append(monthly_table)
-        elements.append(PageBreak())
-        
-        # Expense Details
-        elements.append(Paragraph("Expense Details", heading_style))
-        expense_data = [['Date', 'Name', 'Amount', 'Category']]
-        for e in expenses[:50]:  # Limit to 50 most recent
-            expense_data.append([
-                e['date'], 
-                e['name'][:30], 
-                f'{currency_symbol}{e["amount"]:.2f}', 
-                e['category']
-            ])
-        
-        expense_table = Table(expense_data, colWidths=[1.2*inch, 2.3*inch, 1.2*inch, 1.3*inch])
-        expense_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
-        elements.append(expense_table)
-        
-        # Footer
-        elements.append(Spacer(1, 0.5*inch))
-        elements.append(Paragraph("© 2026 Expense Tracker | Developed by ESC", 
-                                 ParagraphStyle('Footer', parent=styles['Normal'], 
-                                              fontSize=9, textColor=colors.grey, alignment=TA_CENTER)))
-        
-        # Build PDF
-        doc.build(elements)
-        
-        buffer.seek(0)
-        return send_file(
-            buffer,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'expense_report_{datetime.now().strftime("%Y%m%d")}.pdf'
-        )
-    except Exception as e:
-        print(f"Error generating PDF: {e}")
-        import traceback
-        traceback.print_exc()
-        flash(f'Error generating PDF: {str(e)}')
+    status = pdf_jobs.get_status(job_id)
+    if status == 'done':
+        return send_pdf(job_id)
+    if status == 'failed':
+        flash(f'Error generating PDF: {pdf_jobs.get_error(job_id)}')
+        return redirect('/report')
+    if status == 'unknown':
+        # The render died or its file was pruned; the status page would only bounce back here
+        flash('The PDF is no longer available. Please download it again.')
         return redirect('/report')
+    return render_template('pdf_status.html', job_id=job_id)
 
 if __name__ == '__main__':
     app.run(debug=True)
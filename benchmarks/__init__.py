@@ -0,0 +1,11 @@
+# ============================================================
+# BENCHMARKS - Expense Tracker
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+#
+# generate.py    synthetic expenses for N users over M months
+# harness.py     end-to-end request latency through the Flask test client
+# bench_*.py     focused before/after measurements for single changes
+#
+# Run the modules from the repository root, e.g. python -m benchmarks.harness
@@ -0,0 +1,119 @@
+# ============================================================
+# BENCHMARK - Concurrent insert throughput, direct vs group commit
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+#
+# Usage: python benchmarks/bench_group_commit.py [--workers 4] [--threads 8]
+#                                                [--writes 200] [--windows 1,2,5]
+#
+# Starts --workers processes (like gunicorn workers), each running --threads
+# request threads that call database.add_expense --writes times, all against
+# one throwaway database and all starting at the same moment. Runs once with
+# every write committing on its own thread ("direct", the default path) and
+# once per group commit window (GROUP_COMMIT_MS), reporting inserts per
+# second, per-insert latency and writes that failed with "database is locked".
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database as db
+
+CHILD = '''
+import json, sqlite3, sys, threading, time
+import database as db
+import group_commit
+db.DATABASE, threads, writes, start_at, worker = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), float(sys.argv[4]), sys.argv[5]
+group_commit.install()
+latencies, errors = [], []
+
+def run(thread):
+    user_id = f'bench-writer-{worker}-{thread}'
+    db.get_connection()
+    own, failed = [], 0
+    time.sleep(max(0, start_at - time.time()))
+    for i in range(writes):
+        began = time.perf_counter()
+        try:
+            db.add_expense('2026-01-15', f'Expense #{i}', 12345, 'Food', '', user_id)
+        except sqlite3.OperationalError:
+            failed += 1
+            continue
+        own.append((time.perf_counter() - began) * 1000)
+    latencies.extend(own)
+    errors.append(failed)
+
+workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+for thread in workers:
+    thread.start()
+for thread in workers:
+    thread.join()
+print(json.dumps({'latencies': latencies, 'errors': sum(errors), 'finished': time.time(),
+                  'commits': group_commit.stats()['commits'] if group_commit.enabled() else None}))
+'''
+
+# Seconds the children get to import and connect before the common start
+START_DELAY = 2.0
+
+def run_mode(path, window, args):
+    """Run every worker against a new database at path and summarize the writes"""
+    db.DATABASE = path
+    db.init_db()
+    db.close_connections()
+    
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env['CURRENCY_API_URL'] = 'http://127.0.0.1:9/'
+    env.pop('GROUP_COMMIT_MS', None)
+    if window:
+        env['GROUP_COMMIT_MS'] = str(window)
+    
+    start_at = time.time() + START_DELAY
+    children = [subprocess.Popen([sys.executable, '-c', CHILD, path, str(args.threads), str(args.writes),
+                                  repr(start_at), str(i)], env=env, stdout=subprocess.PIPE, text=True)
+                for i in range(args.workers)]
+    outputs = [json.loads(child.communicate()[0].strip().splitlines()[-1]) for child in children]
+    
+    latencies = sorted(ms for output in outputs for ms in output['latencies'])
+    elapsed = max(output['finished'] for output in outputs) - start_at
+    return {
+        'inserts': len(latencies),
+        'errors': sum(output['errors'] for output in outputs),
+        'inserts_per_sec': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) if latencies else 0.0,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] if latencies else 0.0,
+        'commits': sum(output['commits'] for output in outputs) if window else len(latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent insert throughput, direct vs group commit')
+    parser.add_argument('--workers', type=int, default=4, help='processes writing at once')
+    parser.add_argument('--threads', type=int, default=8, help='writing threads per process')
+    parser.add_argument('--writes', type=int, default=200, help='inserts per thread')
+    parser.add_argument('--windows', default='1,2,5', help='comma-separated GROUP_COMMIT_MS values to compare')
+    args = parser.parse_args()
+    windows = [float(window) for window in args.windows.split(',') if window.strip()]
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        results['direct'] = run_mode(os.path.join(tmp, 'direct.db'), None, args)
+        for window in windows:
+            results[f'group {window:g} ms'] = run_mode(os.path.join(tmp, f'group-{window:g}.db'), window, args)
+    
+    print(f"\n{args.workers} workers x {args.threads} threads x {args.writes} inserts")
+    print(f"{'Mode':<14}{'inserts/s':>12}{'p50 (ms)':>10}{'p99 (ms)':>10}{'commits':>10}{'locked':>8}")
+    for mode, result in results.items():
+        print(f"{mode:<14}{result['inserts_per_sec']:>12.0f}{result['p50_ms']:>10.2f}"
+              f"{result['p99_ms']:>10.2f}{result['commits']:>10}{result['errors']:>8}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+# ============================================================
+# BENCHMARK - Page query latency before/after the schema migrations
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+#
+# Usage: python benchmarks/bench_indexes.py [--rows 1000000] [--users 100]
+#
+# Builds a throwaway database at schema version 1 (no secondary indexes,
+# counters or search index) and times the original query shapes behind "/"
+# and "/report". It then applies the remaining migrations and times the same
+# pages through the current database.py functions.
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+CATEGORIES = ['Food', 'Bills', 'Transport', 'Shopping', 'Health', 'Entertainment', 'Others']
+NAMES = ['Groceries', 'Electricity', 'Water bill', 'Internet', 'Jeepney fare', 'Grab ride',
+         'Coffee', 'Lunch', 'Pharmacy', 'Cinema', 'Rent', 'Gym membership', 'Phone load']
+
+PAGE_SQL = 'SELECT id, date, name, amount, category, due_date FROM expenses WHERE user_id = ?'
+
+def populate(conn, rows, users):
+    """Insert rows random expenses spread across users"""
+    rng = random.Random(42)
+    
+    def generate():
+        for i in range(rows):
+            month = rng.randint(1, 24)
+            date = f'{2024 + (month - 1) // 12}-{(month - 1) % 12 + 1:02d}-{rng.randint(1, 28):02d}'
+            yield (date, f'{rng.choice(NAMES)} #{i}', round(rng.uniform(10, 5000), 2),
+                   rng.choice(CATEGORIES), '', f'user-{i % users}')
+    
+    with conn:
+        conn.executemany('''
+            INSERT INTO expenses (date, name, amount, category, due_date, user_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', generate())
+
+def legacy_page(conn, user_id, page=1, search='', category=''):
+    """The original get_all_expenses: COUNT(*) rewrite plus LIMIT/OFFSET"""
+    query, params = PAGE_SQL, [user_id]
+    if search:
+        query += ' AND (name LIKE ? OR category LIKE ?)'
+        params.extend([f'%{search}%', f'%{search}%'])
+    if category:
+        query += ' AND category = ?'
+        params.append(category)
+    conn.execute(query.replace('SELECT id, date, name, amount, category, due_date', 'SELECT COUNT(*)'),
+                 params).fetchone()
+    conn.execute(query + ' ORDER BY date DESC, id DESC LIMIT ? OFFSET ?',
+                 params + [50, (page - 1) * 50]).fetchall()
+
+def deepest_page(rows, users):
+    """Deep page to time for user-0: page 100, or its last page when it has fewer (1: skip it)"""
+    # user-0 gets every users-th row, starting with the first
+    user_rows = (rows + users - 1) // users
+    return max(1, min(100, (user_rows + 49) // 50))
+
+def legacy_workloads(conn, user_id, deep_page):
+    """Baseline query shapes, run against the unmigrated schema"""
+    workloads = {'home page 1': lambda: legacy_page(conn, user_id)}
+    if deep_page > 1:
+        workloads[f'home page {deep_page}'] = lambda: legacy_page(conn, user_id, page=deep_page)
+    workloads.update({
+        'category filter': lambda: legacy_page(conn, user_id, category='Food'),
+        'search': lambda: legacy_page(conn, user_id, search='pharm'),
+        'budget status': lambda: conn.execute(
+            'SELECT SUM(amount) FROM expenses WHERE substr(date, 1, 7) = ? AND user_id = ?',
+            ('2025-06', user_id)).fetchone(),
+        'report data': lambda: [
+            conn.execute('SELECT SUM(amount) FROM expenses WHERE user_id=?', (user_id,)).fetchone(),
+            conn.execute('SELECT category, SUM(amount) FROM expenses WHERE user_id=? GROUP BY category',
+                         (user_id,)).fetchall(),
+            conn.execute('SELECT substr(date, 1, 7) as month, SUM(amount) FROM expenses WHERE user_id=? GROUP BY month',
+                         (user_id,)).fetchall(),
+            conn.execute('SELECT date, name, amount, category, due_date FROM expenses WHERE user_id=? ORDER BY date DESC',
+                         (user_id,)).fetchall(),
+        ],
+    })
+    return workloads
+
+def current_workloads(user_id, deep_page):
+    """The same pages through today's database.py"""
+    workloads = {'home page 1': lambda: db.get_all_expenses(page=1, user_id=user_id)}
+    if deep_page > 1:
+        # Reached the way the next links do, with the previous page's keyset cursor
+        previous_page, _ = db.get_all_expenses(page=deep_page - 1, user_id=user_id)
+        after = db.encode_cursor(previous_page[-1])
+        workloads[f'home page {deep_page}'] = lambda: db.get_all_expenses(user_id=user_id, after=after)
+    workloads.update({
+        'category filter': lambda: db.get_all_expenses(category='Food', user_id=user_id),
+        'search': lambda: db.get_all_expenses(search='pharm', user_id=user_id),
+        'budget status': lambda: db.get_budget_status('2025-06', user_id=user_id),
+        'report data': lambda: db.get_report_data(user_id),
+    })
+    return workloads
+
+def time_workloads(workloads, repeat):
+    """Time each workload and return {label: median milliseconds}"""
+    results = {}
+    for label, workload in workloads.items():
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            workload()
+            samples.append((time.perf_counter() - start) * 1000)
+        results[label] = statistics.median(samples)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Page query latency before/after the schema migrations')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATABASE = os.path.join(tmp, 'bench.db')
+        conn = db.get_connection()
+        db.migrate(conn, target=1)
+        
+        start = time.perf_counter()
+        populate(conn, args.rows, args.users)
+        print(f"Inserted {args.rows:,} rows for {args.users} users in {time.perf_counter() - start:.1f}s")
+        
+        deep_page = deepest_page(args.rows, args.users)
+        before = time_workloads(legacy_workloads(conn, 'user-0', deep_page), args.repeat)
+        db.migrate(conn)
+        after = time_workloads(current_workloads('user-0', deep_page), args.repeat)
+        db.close_connections()
+    
+    print(f"\n{'Query':<20}{'Before (ms)':>14}{'After (ms)':>14}{'Speedup':>10}")
+    for label in before:
+        speedup = before[label] / after[label] if after[label] else float('inf')
+        print(f"{label:<20}{before[label]:>14.2f}{after[label]:>14.2f}{speedup:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# ============================================================
+# BENCHMARK - Full-history PDF statement throughput
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+#
+# Usage: python benchmarks/bench_pdf.py [--sizes 10000,50000,100000]
+#
+# For each history size, fills a throwaway database and renders the full
+# statement (pdf_report.render_report_pdf with full=True), reporting pages per
+# second, rows per second and the process's peak RSS so far. Sizes run in
+# increasing order: flat peak memory and steady pages/sec mean the render is
+# streaming and linear.
+
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+import pdf_report
+
+CATEGORIES = ['Food', 'Bills', 'Transport', 'Shopping', 'Health', 'Entertainment', 'Others']
+NAMES = ['Groceries', 'Electricity', 'Water bill', 'Internet', 'Jeepney fare', 'Grab ride',
+         'Coffee', 'Lunch', 'Pharmacy', 'Cinema', 'Rent', 'Gym membership', 'Phone load']
+
+def populate(rows, user_id):
+    """Insert rows random expenses for one user"""
+    rng = random.Random(42)
+    with db.bulk_insert_expenses() as insert:
+        insert((f'{rng.randint(2020, 2026)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+                f'{rng.choice(NAMES)} #{i}', rng.randint(1000, 500000), rng.choice(CATEGORIES),
+                '', user_id) for i in range(rows))
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def main():
+    parser = argparse.ArgumentParser(description='Full-history PDF statement throughput')
+    parser.add_argument('--sizes', default='10000,50000,100000', help='comma-separated row counts')
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+    
+    print(f"{'Rows':>10}{'Pages':>8}{'Seconds':>10}{'Pages/s':>10}{'Rows/s':>10}{'PDF (MB)':>10}{'Peak RSS (MB)':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            db.DATABASE = os.path.join(tmp, f'bench-{size}.db')
+            db.init_db()
+            populate(size, 'bench')
+            path = os.path.join(tmp, f'statement-{size}.pdf')
+            
+            start = time.perf_counter()
+            pages = pdf_report.render_report_pdf(path, 'bench', 'PHP', 'PHP ', 1.0, full=True)
+            elapsed = time.perf_counter() - start
+            
+            print(f'{size:>10,}{pages:>8,}{elapsed:>10.2f}{pages / elapsed:>10.0f}{size / elapsed:>10,.0f}'
+                  f'{os.path.getsize(path) / 1e6:>10.1f}{peak_rss_mb():>15.0f}')
+            db.close_connections()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# ============================================================
+# BENCHMARK - Report aggregates: rollups vs row scans vs a columnar mirror
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+#
+# Usage: python benchmarks/bench_report_engines.py [--users 4] [--months 240] [--scale 10]
+#                                                  [--repeat 20]
+#
+# Times one user's report aggregates (totals by month and category, the data
+# behind /report) for the user with the longest history in a generated
+# database, computed four ways:
+#   report cache   database.get_report_summary on a cache hit
+#   rollups        the same summary recomputed from expense_rollups (a miss)
+#   sqlite scan    GROUP BY over the user's rows in expenses, as before rollups
+#   duckdb mirror  GROUP BY over a columnar DuckDB copy of expenses; only run
+#                  when the duckdb package is installed. Also reports the cost
+#                  of building the copy and of mirroring changed rows into it.
+#
+# The mirror is not part of the app: this measures whether one would pay off.
+
+import argparse
+import csv
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+import database as db
+from benchmarks import generate
+
+SCAN_SQL = '''
+    SELECT substr(date, 1, 7), category, SUM(amount), COUNT(*) FROM expenses
+    WHERE user_id = ? GROUP BY substr(date, 1, 7), category
+'''
+
+# Changed rows pushed into the mirror when timing incremental refreshes
+MIRROR_BATCH = 1000
+
+def median_ms(func, repeat):
+    """Median wall time of func() in milliseconds, after one untimed call"""
+    func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def build_mirror(tmp):
+    """Copy expenses into a DuckDB table through a CSV file; returns (connection, seconds)"""
+    start = time.perf_counter()
+    path = os.path.join(tmp, 'expenses.csv')
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(db.get_connection().execute(
+            'SELECT id, user_id, date, category, amount FROM expenses'))
+    mirror = duckdb.connect(os.path.join(tmp, 'mirror.duckdb'))
+    mirror.execute('''
+        CREATE TABLE expenses AS SELECT * FROM read_csv(?, header = false, columns = {
+            'id': 'BIGINT', 'user_id': 'VARCHAR', 'date': 'VARCHAR', 'category': 'VARCHAR', 'amount': 'BIGINT'})
+    ''', [path])
+    return mirror, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Report aggregates: rollups vs row scans vs a columnar mirror')
+    parser.add_argument('--users', type=int, default=4)
+    parser.add_argument('--months', type=int, default=240)
+    parser.add_argument('--scale', type=float, default=10.0)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATABASE = os.path.join(tmp, 'bench.db')
+        rows = generate.generate(args.users, args.months, args.scale)
+        conn = db.get_connection()
+        user_id, count = conn.execute('SELECT user_id, count FROM expense_counts ORDER BY count DESC LIMIT 1').fetchone()
+        print(f"Generated {rows:,} expenses; timing {user_id} ({count:,} rows)")
+        
+        db.get_report_summary(user_id)
+        results['report cache'] = median_ms(lambda: db.get_report_summary(user_id), args.repeat)
+        results['rollups'] = median_ms(lambda: db._compute_report_summary(user_id), args.repeat)
+        results['sqlite scan'] = median_ms(lambda: conn.execute(SCAN_SQL, (user_id,)).fetchall(), args.repeat)
+        
+        if duckdb is None:
+            print("duckdb is not installed; skipping the mirror (pip install duckdb)")
+        else:
+            mirror, build_seconds = build_mirror(tmp)
+            results['duckdb mirror'] = median_ms(
+                lambda: mirror.execute(SCAN_SQL, [user_id]).fetchall(), args.repeat)
+            changed = conn.execute('SELECT id, user_id, date, category, amount FROM expenses LIMIT ?',
+                                   (MIRROR_BATCH,)).fetchall()
+            start = time.perf_counter()
+            mirror.execute('BEGIN')
+            mirror.executemany('DELETE FROM expenses WHERE id = ?', [(row[0],) for row in changed])
+            mirror.executemany('INSERT INTO expenses VALUES (?, ?, ?, ?, ?)', changed)
+            mirror.execute('COMMIT')
+            refresh_ms = (time.perf_counter() - start) * 1000 / len(changed)
+            print(f"Mirror: built in {build_seconds:.2f}s, {refresh_ms:.2f} ms per changed row to refresh")
+            mirror.close()
+        db.close_connections()
+    
+    print(f"\n{'Engine':<16}{'ms per report':>14}")
+    for engine, ms in results.items():
+        print(f"{engine:<16}{ms:>14.3f}")
+
+if __name__ == '__main__':
+    main()
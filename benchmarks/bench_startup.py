@@ -0,0 +1,118 @@
+# ============================================================
+# BENCHMARK - Cold start: import to first request served
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+#
+# Usage: python benchmarks/bench_startup.py [--rows 1000000] [--repeat 5]
+#
+# Starts a fresh interpreter per sample, the way every gunicorn worker boots,
+# and times "import flask" (the framework alone), "import database",
+# "import app" and the first GET / through Flask's test client. Scenarios:
+#   fresh    empty directory: every migration plus the data.csv seed
+#   current  database already at the latest schema version
+#   legacy   same database, also replaying the checks importing database.py
+#            used to run (migrate, data.csv exists + COUNT(*), migrate again)
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database as db
+
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+import flask
+imported_flask = time.perf_counter()
+import database as db
+imported_db = time.perf_counter()
+if sys.argv[1] == 'legacy':
+    db.migrate()
+    db.migrate_from_csv()
+    db.migrate()
+import app
+imported_app = time.perf_counter()
+response = app.app.test_client().get('/')
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    'import flask': (imported_flask - start) * 1000,
+    'import database': (imported_db - imported_flask) * 1000,
+    'import app': (imported_app - imported_db) * 1000,
+    'first request': (served - imported_app) * 1000,
+    'total': (served - start) * 1000,
+}))
+'''
+
+def child_env(workdir):
+    """Environment for a sample: repo on the path, no network, files in workdir"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env['CURRENCY_API_URL'] = 'http://127.0.0.1:9/'
+    env['RATES_SNAPSHOT_PATH'] = os.path.join(workdir, 'rates.snapshot')
+    return env
+
+def sample(workdir, scenario):
+    """Boot one interpreter in workdir and return its timings"""
+    result = subprocess.run([sys.executable, '-c', CHILD, scenario], cwd=workdir, env=child_env(workdir),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def populate(path, rows):
+    """Create a database at the latest schema with rows expenses for one user"""
+    rng = random.Random(42)
+    db.DATABASE = path
+    db.init_db()
+    with db.bulk_insert_expenses() as insert:
+        insert((f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}', f'Expense #{i}',
+                rng.randint(1000, 500000), 'Food', '', 'default') for i in range(rows))
+    db.close_connections()
+
+def median_timings(samples):
+    return {label: statistics.median(s[label] for s in samples) for label in samples[0]}
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold start: import to first request served')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        seed = os.path.join(ROOT, 'data.csv')
+        
+        samples = []
+        for i in range(args.repeat):
+            workdir = os.path.join(tmp, f'fresh-{i}')
+            os.makedirs(workdir)
+            if os.path.exists(seed):
+                shutil.copy(seed, workdir)
+            samples.append(sample(workdir, 'fresh'))
+        results['fresh'] = median_timings(samples)
+        
+        workdir = os.path.join(tmp, 'existing')
+        os.makedirs(workdir)
+        if os.path.exists(seed):
+            shutil.copy(seed, workdir)
+        populate(os.path.join(workdir, 'expenses.db'), args.rows)
+        print(f"Populated {args.rows:,} rows")
+        for scenario in ('current', 'legacy'):
+            results[scenario] = median_timings([sample(workdir, scenario) for _ in range(args.repeat)])
+    
+    labels = list(results['fresh'])
+    print(f"\n{'Scenario':<10}" + ''.join(f'{label + " (ms)":>21}' for label in labels))
+    for scenario, timings in results.items():
+        print(f'{scenario:<10}' + ''.join(f'{timings[label]:>21.1f}' for label in labels))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# ============================================================
+# CHECK - Background rate refresher against a stub currency API
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+#
+# Usage: python benchmarks/check_rate_refresher.py [--delay 4]
+#
+# Serves a stub currency API from a local http.server that takes --delay
+# seconds to answer, then boots two workers against it in a throwaway
+# directory with no cached rates, the second while the first worker's
+# refresher is still waiting on the API. Checks that:
+#   - "import app" returns in both workers without waiting on the API
+#   - the fetched rates are published afterwards and both workers see them
+#   - only one worker called the API
+# Exits non-zero if any check fails.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# USD rate the stub answers with; the fallback rate differs, so seeing it proves the fetch landed
+STUB_USD_RATE = 0.0123
+
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+import config
+imported = time.perf_counter()
+deadline = imported + float(sys.argv[1])
+while config.get_rate('USD') != float(sys.argv[2]) and time.perf_counter() < deadline:
+    time.sleep(0.05)
+published = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'published_ms': (published - start) * 1000 if config.get_rate('USD') == float(sys.argv[2]) else None,
+}))
+'''
+
+def stub_server(delay):
+    """Start a slow stub currency API; returns (server, requests received, first request event)"""
+    calls = []
+    called = threading.Event()
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            calls.append(self.path)
+            called.set()
+            time.sleep(delay)
+            body = json.dumps({'base': 'PHP', 'rates': {'USD': STUB_USD_RATE}}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, calls, called
+
+def start_worker(workdir, url, wait):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env['CURRENCY_API_URL'] = url
+    env['RATES_SNAPSHOT_PATH'] = os.path.join(workdir, 'rates.snapshot')
+    return subprocess.Popen([sys.executable, '-c', CHILD, str(wait), repr(STUB_USD_RATE)], cwd=workdir, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the background rate refresher against a stub API')
+    parser.add_argument('--delay', type=float, default=4.0, help='seconds the stub API takes to answer')
+    args = parser.parse_args()
+    
+    server, calls, called = stub_server(args.delay)
+    url = f'http://127.0.0.1:{server.server_address[1]}/latest/PHP'
+    # Imports should take a fraction of the API delay; allow half of it
+    limit_ms = args.delay * 1000 / 2
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        first = start_worker(workdir, url, args.delay * 3)
+        if not called.wait(args.delay * 3):
+            sys.exit('FAIL: the first worker never called the stub API')
+        # The first worker's refresher now holds the refresh lock until the stub answers
+        second = start_worker(workdir, url, args.delay * 3)
+        results = {}
+        for name, worker in (('first', first), ('second', second)):
+            output = worker.communicate()[0].strip().splitlines()
+            if worker.returncode != 0 or not output:
+                sys.exit(f'FAIL: the {name} worker exited with {worker.returncode}')
+            results[name] = json.loads(output[-1])
+    server.shutdown()
+    
+    failures = []
+    for name, result in results.items():
+        print(f"{name:<8} import app {result['import_ms']:8.1f} ms   rates published after "
+              + (f"{result['published_ms']:.1f} ms" if result['published_ms'] is not None else 'never'))
+        if result['import_ms'] > limit_ms:
+            failures.append(f'{name} worker waited on the API during import ({result["import_ms"]:.0f} ms)')
+        if result['published_ms'] is None:
+            failures.append(f'{name} worker never saw the fetched rates')
+    print(f"API calls: {len(calls)}")
+    if len(calls) != 1:
+        failures.append(f'expected one API call across both workers, got {len(calls)}')
+    
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
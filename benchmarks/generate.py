@@ -0,0 +1,140 @@
+# ============================================================
+# BENCHMARK - Synthetic expense data generator
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+#
+# Usage: python -m benchmarks.generate [--database expenses.db] [--users 50]
+#                                      [--months 24] [--scale 1] [--seed 42] [--replace]
+#
+# Writes realistic expenses straight into the database for N users over the M
+# months ending with the current one: monthly bills on a fixed day, daily food
+# and transport, occasional bigger purchases, and a monthly budget per user.
+# About 65 rows per user per month at --scale 1; --scale multiplies the
+# day-to-day spending. The same seed always produces the same data.
+#
+# Users are named bench-user-0001, bench-user-0002, ... so they never collide
+# with real browser ids; --replace deletes their previous rows first.
+
+import argparse
+import calendar
+import math
+import os
+import random
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import database as db
+
+USER_PREFIX = 'bench-user-'
+
+# Bills: (category, name, typical amount in PHP), paid once a month on a fixed day
+BILLS = [
+    ('Rent', 'Rent', 15000),
+    ('Utilities', 'Electricity', 2500),
+    ('Utilities', 'Water bill', 600),
+    ('Utilities', 'Internet', 1700),
+    ('Car Insurance', 'Car insurance', 2000),
+]
+
+# Day-to-day spending: (category, names, typical amount in PHP, times per month)
+SPENDING = [
+    ('Food', ['Groceries', 'Lunch', 'Coffee', 'Dinner out', 'Snacks', 'Bakery'], 250, 30),
+    ('Transportation', ['Jeepney fare', 'Grab ride', 'Gas', 'Parking', 'Bus fare'], 120, 20),
+    ('Entertainment', ['Cinema', 'Streaming', 'Concert', 'Games'], 500, 3),
+    ('Healthcare', ['Pharmacy', 'Clinic', 'Dentist'], 800, 1),
+    ('Shopping', ['Clothes', 'Gadgets', 'Household', 'Gifts'], 1500, 3),
+    ('Education', ['Books', 'Online course', 'School supplies'], 1200, 0.5),
+    ('Others', ['Haircut', 'Laundry', 'Donation'], 300, 2),
+]
+
+def user_ids(count):
+    """Ids of the first count generated users"""
+    return [f'{USER_PREFIX}{i:04d}' for i in range(1, count + 1)]
+
+def recent_months(count, today=None):
+    """The last count months as (year, month), oldest first, ending with today's"""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1
+    return [(i // 12, i % 12 + 1) for i in range(index - count + 1, index + 1)]
+
+def _occurrences(rng, expected):
+    """How many times something expected this often happens in one month (roughly Poisson)"""
+    return max(0, round(rng.gauss(expected, math.sqrt(expected))))
+
+def _amount(rng, typical):
+    """A right-skewed amount around typical, in centavos"""
+    return config.to_minor(round(rng.lognormvariate(math.log(typical), 0.5), 2))
+
+def generate_user(rng, user_id, months, scale=1.0, today=None):
+    """Yield (date, name, amount, category, due_date, user_id) rows for one user"""
+    today = today or date.today()
+    # Each user spends on their own level and pays a fixed subset of the bills
+    level = rng.lognormvariate(0, 0.3)
+    bills = [(bill, rng.randint(1, 28)) for bill in BILLS if rng.random() < 0.8]
+    
+    for year, month in months:
+        last_day = calendar.monthrange(year, month)[1]
+        if (year, month) == (today.year, today.month):
+            last_day = today.day
+        prefix = f'{year}-{month:02d}'
+        
+        for (category, name, typical), day in bills:
+            if day <= last_day:
+                paid = f'{prefix}-{max(1, day - rng.randint(0, 3)):02d}'
+                yield (paid, name, _amount(rng, typical * level), category, f'{prefix}-{day:02d}', user_id)
+        
+        for category, names, typical, per_month in SPENDING:
+            for _ in range(_occurrences(rng, per_month * scale * last_day / 30)):
+                yield (f'{prefix}-{rng.randint(1, last_day):02d}', rng.choice(names),
+                       _amount(rng, typical * level), category, '', user_id)
+
+def expected_monthly_spending(scale=1.0):
+    """Typical monthly spending of an average generated user, in PHP"""
+    bills = sum(typical for _, _, typical in BILLS)
+    return bills + scale * sum(typical * times for _, _, typical, times in SPENDING)
+
+def generate(users=50, months=24, scale=1.0, seed=42, replace=False):
+    """Fill the current database with generated users and return the number of rows inserted"""
+    db.init_db()
+    rng = random.Random(seed)
+    month_list = recent_months(months)
+    ids = user_ids(users)
+    
+    if replace:
+        for user_id in ids:
+            db.delete_all_expenses(user_id)
+    
+    inserted = 0
+    with db.deferred_checkpoints():
+        for user_id in ids:
+            with db.bulk_insert_expenses(user_id) as insert:
+                inserted += insert(generate_user(rng, user_id, month_list, scale))
+            # Budgets land close to what the user spends, so some months run over
+            budget = config.to_minor(round(expected_monthly_spending(scale) * rng.uniform(0.7, 1.4), -2))
+            for year, month in month_list:
+                db.set_budget(budget, f'{year}-{month:02d}', user_id)
+    return inserted
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic expenses for benchmarking')
+    parser.add_argument('--database', default=db.DATABASE, help='database file to fill (default: %(default)s)')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier for day-to-day spending rows')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--replace', action='store_true', help='delete the generated users\' rows first')
+    args = parser.parse_args()
+    
+    db.DATABASE = args.database
+    start = time.perf_counter()
+    rows = generate(args.users, args.months, args.scale, args.seed, args.replace)
+    print(f"✓ Generated {rows:,} expenses for {args.users} users over {args.months} months "
+          f"in {args.database} ({time.perf_counter() - start:.1f}s)")
+
+if __name__ == '__main__':
+    main()
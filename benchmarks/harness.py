@@ -0,0 +1,219 @@
+# ============================================================
+# BENCHMARK - End-to-end request latency and throughput
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+#
+# Usage: python -m benchmarks.harness [--database bench.db] [--requests 200]
+#                                     [--workloads home,search,...] [--json results.json]
+#
+# Sends timed requests through Flask's test client, so every sample covers
+# routing, database.py and template rendering but no network. Requests rotate
+# over the generated users (benchmarks/generate.py); each workload reports
+# p50/p95/p99 latency and requests per second. Without --database a fresh
+# throwaway database is generated first (--users, --months, --scale, --seed).
+#
+# --json writes the results, the git commit and the environment as one JSON
+# document ('-' for stdout), so runs can be stored and compared over time.
+#
+#   home          GET /
+#   search        GET /?search=<word>
+#   report        GET /report
+#   download      GET /download (the CSV export, read to the end)
+#   download_pdf  GET /download_pdf, polling the job until the PDF is served.
+#                 Rendered PDFs are cached per user and data version, so only
+#                 the first request per user renders.
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep the rate refresher off the network (read when config is imported)
+os.environ.setdefault('CURRENCY_API_URL', 'http://127.0.0.1:9/')
+
+import database as db
+from benchmarks import generate
+
+SEARCH_WORDS = ['groc', 'lunch', 'grab', 'pharmacy', 'rent', 'coffee', 'gadgets', 'internet']
+
+# Seconds between status polls while a PDF renders, and how long to wait for one
+PDF_POLL_INTERVAL = 0.02
+PDF_TIMEOUT = 120
+
+def _get(client, path):
+    """GET path, read the whole body and fail on anything but 200"""
+    response = client.get(path)
+    body = response.get_data()
+    if response.status_code != 200:
+        raise RuntimeError(f'GET {path} returned {response.status_code}')
+    return body
+
+def _download_pdf(client):
+    """Request the PDF and follow the background job until the file is served"""
+    response = client.get('/download_pdf?format=json')
+    if response.status_code == 200:
+        return response.get_data()
+    if response.status_code != 202:
+        raise RuntimeError(f'GET /download_pdf returned {response.status_code}')
+    
+    job = response.get_json()
+    deadline = time.monotonic() + PDF_TIMEOUT
+    while job['status'] == 'pending':
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"PDF job {job['job_id']} did not finish in {PDF_TIMEOUT}s")
+        time.sleep(PDF_POLL_INTERVAL)
+        job = client.get(job['status_url']).get_json()
+    if job['status'] != 'done':
+        raise RuntimeError(f"PDF job {job['job_id']} {job['status']}: {job.get('error')}")
+    return _get(client, job['result_url'])
+
+# Workload name -> request(client, iteration)
+WORKLOADS = {
+    'home': lambda client, i: _get(client, '/'),
+    'search': lambda client, i: _get(client, f'/?search={SEARCH_WORDS[i % len(SEARCH_WORDS)]}'),
+    'report': lambda client, i: _get(client, '/report'),
+    'download': lambda client, i: _get(client, '/download'),
+    'download_pdf': lambda client, i: _download_pdf(client),
+}
+
+def user_clients(flask_app, users):
+    """One test client per user, with the session already pointing at that user"""
+    clients = []
+    for user_id in users:
+        client = flask_app.test_client()
+        with client.session_transaction() as session:
+            session['browser_id'] = user_id
+            session['user'] = {'id': 0, 'username': user_id, 'role': 'user'}
+        clients.append(client)
+    return clients
+
+def percentile(sorted_samples, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(sorted_samples) - 1, round(fraction * len(sorted_samples) + 0.5) - 1))
+    return sorted_samples[index]
+
+def run_workload(request, clients, requests, warmup):
+    """Time requests calls of request, rotating over clients, and summarize them"""
+    for i in range(warmup):
+        request(clients[i % len(clients)], i)
+    
+    samples, errors = [], 0
+    start = time.perf_counter()
+    for i in range(requests):
+        began = time.perf_counter()
+        try:
+            request(clients[i % len(clients)], i)
+        except Exception as e:
+            errors += 1
+            if errors == 1:
+                print(f"  first error: {e}", file=sys.stderr)
+            continue
+        samples.append((time.perf_counter() - began) * 1000)
+    elapsed = time.perf_counter() - start
+    
+    samples.sort()
+    result = {'requests': requests, 'errors': errors, 'seconds': round(elapsed, 3),
+              'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else 0.0}
+    if samples:
+        result.update({
+            'mean_ms': round(statistics.fmean(samples), 3),
+            'p50_ms': round(percentile(samples, 0.50), 3),
+            'p95_ms': round(percentile(samples, 0.95), 3),
+            'p99_ms': round(percentile(samples, 0.99), 3),
+            'max_ms': round(samples[-1], 3),
+        })
+    return result
+
+def git_commit():
+    """The checked-out commit, or None outside a git work tree"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end request latency and throughput')
+    parser.add_argument('--database', help='existing database with generated users (default: generate a fresh one)')
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per workload')
+    parser.add_argument('--warmup', type=int, default=10, help='untimed requests per workload')
+    parser.add_argument('--workloads', default=','.join(WORKLOADS), help='comma-separated subset to run')
+    parser.add_argument('--users', type=int, default=20, help='generated users to rotate over')
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help="write machine-readable results to this file ('-' for stdout)")
+    args = parser.parse_args()
+    
+    names = [name.strip() for name in args.workloads.split(',') if name.strip()]
+    unknown = [name for name in names if name not in WORKLOADS]
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(unknown)} (choose from {', '.join(WORKLOADS)})")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.database:
+            db.DATABASE = args.database
+            db.init_db()
+        else:
+            db.DATABASE = os.path.join(tmp, 'bench.db')
+            rows = generate.generate(args.users, args.months, args.scale, args.seed)
+            print(f"Generated {rows:,} expenses for {args.users} users", file=sys.stderr)
+        
+        users = [row[0] for row in db.get_connection().execute(
+            'SELECT user_id FROM expense_counts WHERE user_id LIKE ? ORDER BY user_id LIMIT ?',
+            (generate.USER_PREFIX + '%', args.users))]
+        if not users:
+            parser.error(f'{db.DATABASE} has no generated users; run python -m benchmarks.generate first')
+        expenses = db.get_connection().execute(
+            'SELECT SUM(count) FROM expense_counts WHERE user_id LIKE ?',
+            (generate.USER_PREFIX + '%',)).fetchone()[0]
+        
+        # Rendered PDFs go to the throwaway directory (read when pdf_jobs is imported)
+        os.environ.setdefault('PDF_CACHE_DIR', os.path.join(tmp, 'pdf_cache'))
+        import app
+        clients = user_clients(app.app, users)
+        
+        results = {}
+        for name in names:
+            print(f"Running {name} ...", file=sys.stderr)
+            results[name] = run_workload(WORKLOADS[name], clients, args.requests, args.warmup)
+    
+    print(f"\n{'Workload':<14}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'req/s':>10}{'errors':>8}")
+    for name, result in results.items():
+        print(f"{name:<14}{result.get('p50_ms', 0):>10.2f}{result.get('p95_ms', 0):>10.2f}"
+              f"{result.get('p99_ms', 0):>10.2f}{result['throughput_rps']:>10.1f}{result['errors']:>8}")
+    
+    if args.json:
+        document = {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'dataset': {'database': args.database, 'users': len(users), 'expenses': expenses},
+            'settings': {'requests': args.requests, 'warmup': args.warmup},
+            'workloads': results,
+        }
+        if not args.database:
+            document['dataset'].update(months=args.months, scale=args.scale, seed=args.seed)
+        text = json.dumps(document, indent=2)
+        if args.json == '-':
+            print(text)
+        else:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
+            print(f"\n✓ Results written to {args.json}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# ============================================================
+# COLUMNAR EXPORT - Expense Tracker
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+# Machine-oriented exports of a user's expenses as Parquet or Arrow IPC files,
+# for loading into pandas, Polars, DuckDB, Spark and the like. Unlike the CSV
+# report, columns are typed and nothing is formatted:
+#
+#   date      date32, null when the stored date is not a valid ISO date
+#             (older rows saved from the form were never validated)
+#   name      string
+#   amount    decimal128(18, 2), exact, in the base currency (PHP)
+#   category  string
+#   due_date  date32, null when not set
+#
+# Rows are read from the database a batch at a time and each batch is
+# written as its own zstd-compressed row group (Parquet) or record batch
+# (Arrow), so the response streams and memory stays flat however long the
+# history is. Parquet dictionary-encodes repetitive columns like category
+# on its own.
+#
+# Needs the optional pyarrow package; without it available() is False.
+
+from datetime import date
+from decimal import Decimal
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+import config
+import database as db
+
+# Rows per Parquet row group / Arrow record batch
+EXPORT_BATCH_ROWS = 50000
+
+# Format -> (mimetype, file extension)
+FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', '.arrow'),
+}
+
+def available():
+    """Whether pyarrow is installed"""
+    return pa is not None
+
+def schema():
+    """Arrow schema of the exported columns"""
+    return pa.schema([
+        pa.field('date', pa.date32()),
+        pa.field('name', pa.string(), nullable=False),
+        pa.field('amount', pa.decimal128(18, 2), nullable=False),
+        pa.field('category', pa.string(), nullable=False),
+        pa.field('due_date', pa.date32()),
+    ], metadata={'currency': config.DEFAULT_CURRENCY})
+
+def _parse_date(text):
+    try:
+        return date.fromisoformat(text) if text else None
+    except ValueError:
+        return None
+
+def record_batch(rows, export_schema):
+    """Build an Arrow record batch from (date, name, amount in centavos, category, due_date) rows"""
+    dates, names, amounts, categories, due_dates = zip(*rows)
+    return pa.record_batch([
+        pa.array([_parse_date(text) for text in dates], pa.date32()),
+        pa.array(names, pa.string()),
+        pa.array([Decimal(amount).scaleb(-2) for amount in amounts], pa.decimal128(18, 2)),
+        pa.array(categories, pa.string()),
+        pa.array([_parse_date(text) for text in due_dates], pa.date32()),
+    ], schema=export_schema)
+
+class _Chunks:
+    """Write-only file object that holds what a writer produced until it is drained"""
+    
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+    
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self.position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+def stream_export(user_id, fmt):
+    """Encode a user's expenses in fmt ('parquet' or 'arrow') as a stream of byte chunks"""
+    export_schema = schema()
+    chunks = _Chunks()
+    sink = pa.PythonFile(chunks, mode='w')
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, export_schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(sink, export_schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+    
+    for rows in db.iter_expense_batches(user_id, EXPORT_BATCH_ROWS):
+        writer.write_batch(record_batch(rows, export_schema))
+        yield chunks.drain()
+    writer.close()
+    yield chunks.drain()
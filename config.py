@@ -4,6 +4,15 @@
 # Copyright (c) 2026
 # ============================================================
 
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from types import MappingProxyType
+
+import shared_rates
+
 # MODE: 'PERSONAL' (single user, no login) or 'CORPORATE' (multi-user with login)
 MODE = 'PERSONAL'
 
@@ -29,8 +38,28 @@ FALLBACK_CONVERSION_RATES = {
     'KRW': 24.0,
 }
 
-CONVERSION_RATES = FALLBACK_CONVERSION_RATES.copy()
-CURRENCY_API_URL = 'https://api.exchangerate-api.com/v4/latest/PHP'
+# Read-only snapshot of the current rates; replaced (never mutated) on refresh.
+# Read it through current_rates() to pick up refreshes made by other workers.
+CONVERSION_RATES = MappingProxyType(FALLBACK_CONVERSION_RATES.copy())
+RATES_UPDATED_AT = None
+CURRENCY_API_URL = os.environ.get('CURRENCY_API_URL', 'https://api.exchangerate-api.com/v4/latest/PHP')
+
+# Memory-mapped snapshot shared by every worker process on this host
+RATES_SNAPSHOT_PATH = os.environ.get('RATES_SNAPSHOT_PATH', 'rates.snapshot')
+
+# Rates are refreshed once they are this old; failed refreshes retry sooner
+RATES_MAX_AGE_HOURS = 24
+RATES_RETRY_SECONDS = 15 * 60
+
+_refresh_lock = threading.Lock()
+_refresher_pid = None
+_refresher_stop = None
+# Outcomes of fetch_live_rates() in this process (read by metrics.py)
+_refresh_stats = {'fetched': 0, 'fresh': 0, 'failed': 0}
+
+_shared = None
+_shared_opened = False
+_shared_version = 0
 
 # Country to Currency mapping
 COUNTRIES = {
@@ -56,11 +85,24 @@ def get_currency_symbol(country_name=None):
         return COUNTRIES[country_name]['symbol']
     return COUNTRIES[DEFAULT_COUNTRY]['symbol']
 
+# Amounts are stored as integers in minor units of the base currency (centavos),
+# so sums are exact. They become decimal amounts only for display.
+MINOR_UNITS = 100
+
+def to_minor(amount):
+    """Round a base currency amount to integer minor units (half away from zero)"""
+    # repr() keeps the digits as typed (12.345, not 12.3449999...) before rounding
+    return int((Decimal(repr(amount)) * MINOR_UNITS).quantize(Decimal(1), ROUND_HALF_UP))
+
+def from_minor(minor):
+    """Turn integer minor units back into a base currency amount"""
+    return minor / MINOR_UNITS
+
 def convert_to_base(amount, from_currency):
     """Convert from any currency to base currency (PHP)"""
     if from_currency == 'PHP':
         return amount
-    rate = CONVERSION_RATES.get(from_currency, 1.0)
+    rate = current_rates().get(from_currency, 1.0)
     # If 1 PHP = X currency, then 1 currency = 1/X PHP
     return amount / rate
 
@@ -68,9 +110,30 @@ def convert_from_base(amount, to_currency):
     """Convert from base currency (PHP) to any currency"""
     if to_currency == 'PHP':
         return amount
-    rate = CONVERSION_RATES.get(to_currency, 1.0)
+    rate = current_rates().get(to_currency, 1.0)
     return amount * rate
 
+def get_rate(to_currency):
+    """Get the multiplier that converts base currency (PHP) amounts into to_currency"""
+    if to_currency == 'PHP':
+        return 1.0
+    return current_rates().get(to_currency, 1.0)
+
+# Batch conversions: look the rate up once (get_rate) and apply it to a whole
+# result set of stored minor units. Row-level amounts are converted in SQL
+# instead (amount * ? / MINOR_UNITS).
+
+def convert_totals(totals, rate):
+    """Convert every minor-unit amount in a {key: amount} mapping for display"""
+    return {key: from_minor(amount) * rate for key, amount in totals.items()}
+
+def convert_budget_status(budget_status, rate):
+    """Convert the minor-unit money fields of a budget status dict for display"""
+    converted = dict(budget_status)
+    for field in ('budget', 'spent', 'remaining'):
+        converted[field] = from_minor(budget_status[field]) * rate
+    return converted
+
 def get_conversion_rate(from_currency, to_currency):
     """Get the conversion rate between two currencies"""
     if from_currency == to_currency:
@@ -79,49 +142,234 @@ def get_conversion_rate(from_currency, to_currency):
     base_amount = convert_to_base(1.0, from_currency)
     return convert_from_base(base_amount, to_currency)
 
+# ============================================================
+# SHARED RATES SNAPSHOT
+# ============================================================
+# Workers publish rates to a memory-mapped snapshot (shared_rates.py). Readers
+# only compare its version number with the one they last loaded, so the hot
+# path takes no lock and makes no database query. Platforms without flock
+# keep a private per-process snapshot instead.
+
+def _get_shared():
+    """This process's handle on the shared snapshot, or None if unavailable"""
+    global _shared, _shared_opened
+    
+    if not _shared_opened:
+        _shared_opened = True
+        if shared_rates.is_supported():
+            try:
+                _shared = shared_rates.SharedRates(RATES_SNAPSHOT_PATH, FALLBACK_CONVERSION_RATES)
+            except OSError as e:
+                print(f"Shared rates snapshot unavailable, using per-process rates: {e}")
+    return _shared
+
+def _forget_shared():
+    """After fork: the child opens its own handle (flock must not be shared)"""
+    global _shared, _shared_opened, _refresher_pid
+    _shared = None
+    _shared_opened = False
+    _refresher_pid = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_shared)
+
+def current_rates():
+    """Get the current rates snapshot, picking up anything another worker published"""
+    global CONVERSION_RATES, RATES_UPDATED_AT, _shared_version
+    
+    shared = _get_shared()
+    if shared is not None and shared.version() != _shared_version:
+        snapshot = shared.read()
+        if snapshot:
+            version, rates, updated_at = snapshot
+            CONVERSION_RATES = MappingProxyType(rates)
+            RATES_UPDATED_AT = updated_at
+            _shared_version = version
+    return CONVERSION_RATES
+
+def rates_updated_at():
+    """Get when the current rates were fetched (UTC), or None for fallback rates"""
+    current_rates()
+    return RATES_UPDATED_AT
+
+@contextmanager
+def _refresh_guard():
+    """Serialize refreshes across threads and, via flock, across worker processes
+    
+    This is the snapshot's refresh lock, not its writer lock: it is held for
+    the whole API call, and opening or publishing the snapshot must not wait
+    on that.
+    """
+    with _refresh_lock:
+        shared = _get_shared()
+        if shared is None:
+            yield
+        else:
+            with shared.refresh_lock():
+                yield
+
+def _set_local_rates(snapshot, updated_at):
+    """Make a complete rates snapshot current in this process only"""
+    global CONVERSION_RATES, RATES_UPDATED_AT
+    # One reference assignment: readers see the old or the new snapshot, never a mix
+    CONVERSION_RATES = MappingProxyType(snapshot)
+    RATES_UPDATED_AT = updated_at
+
+def _publish_rates(rates, updated_at):
+    """Publish a new rates snapshot to this process and the shared file (hold _refresh_guard)"""
+    global _shared_version
+    
+    snapshot = FALLBACK_CONVERSION_RATES.copy()
+    snapshot.update(rates)
+    
+    shared = _get_shared()
+    if shared is not None:
+        with shared.lock():
+            _shared_version = shared.write(snapshot, updated_at)
+    _set_local_rates(snapshot, updated_at)
+
+def _rates_age_hours(updated_at):
+    """Hours since a currency_rates timestamp (SQLite CURRENT_TIMESTAMP is UTC)"""
+    update_time = datetime.strptime(updated_at, '%Y-%m-%d %H:%M:%S')
+    return (datetime.utcnow() - update_time).total_seconds() / 3600
+
+def rates_age_seconds():
+    """Seconds since the current rates were fetched, or None for fallback rates"""
+    updated_at = rates_updated_at()
+    if not updated_at:
+        return None
+    try:
+        return _rates_age_hours(updated_at) * 3600
+    except ValueError:
+        return None
+
+def load_cached_rates():
+    """Use the rates stored in the database in this process, without the network or the refresh lock
+    
+    The lock can be held by another worker's API call for seconds, and worker
+    startup must not wait on that. The refresher publishes these rates to the
+    shared snapshot on its first run.
+    """
+    import database as db
+    
+    cached_rates, last_update = db.get_currency_rates()
+    if cached_rates:
+        snapshot = FALLBACK_CONVERSION_RATES.copy()
+        snapshot.update(cached_rates)
+        _set_local_rates(snapshot, last_update)
+    return cached_rates, last_update
+
+def _load_cached_rates():
+    """Publish the database's rates to the shared snapshot too (hold _refresh_guard)"""
+    import database as db
+    
+    cached_rates, last_update = db.get_currency_rates()
+    if cached_rates:
+        _publish_rates(cached_rates, last_update)
+    return cached_rates, last_update
+
 def fetch_live_rates():
     """Fetch live currency rates from API with 24-hour caching"""
-    global CONVERSION_RATES
-    
     import urllib.request
     import json
-    from datetime import datetime
     import database as db
     
-    cached_rates, last_update = db.get_currency_rates()
-    
-    if cached_rates and last_update:
+    with _refresh_guard():
+        # Another worker may have refreshed while we waited for the lock
+        current_rates()
+        # Nothing published yet: start from the cached rates (and share them)
+        if RATES_UPDATED_AT is None or (_get_shared() is not None and _shared_version == 0):
+            _load_cached_rates()
+        
+        if RATES_UPDATED_AT:
+            try:
+                hours_since_update = _rates_age_hours(RATES_UPDATED_AT)
+                
+                if hours_since_update < RATES_MAX_AGE_HOURS:
+                    _refresh_stats['fresh'] += 1
+                    return True, f"Using cached rates (updated {int(hours_since_update)} hours ago)"
+            except ValueError:
+                pass
+        
+        source = 'cached' if RATES_UPDATED_AT else 'fallback'
         try:
-            update_time = datetime.strptime(last_update, '%Y-%m-%d %H:%M:%S')
-            hours_since_update = (datetime.now() - update_time).total_seconds() / 3600
-            
-            if hours_since_update < 24:
-                CONVERSION_RATES.update(cached_rates)
-                return True, f"Using cached rates (updated {int(hours_since_update)} hours ago)"
-        except:
-            pass
+            with urllib.request.urlopen(CURRENCY_API_URL, timeout=5) as response:
+                data = json.loads(response.read().decode())
+        except Exception:
+            # Keep serving whatever snapshot we have (cached or fallback rates)
+            _refresh_stats['failed'] += 1
+            return False, f"API failed, using {source} rates"
+        
+        if 'rates' not in data:
+            _refresh_stats['failed'] += 1
+            return False, f"API failed, using {source} rates"
+        
+        new_rates = {
+            currency: data['rates'].get(currency, fallback)
+            for currency, fallback in FALLBACK_CONVERSION_RATES.items()
+        }
+        new_rates['PHP'] = 1.0
+        
+        db.update_currency_rates(new_rates)
+        _publish_rates(new_rates, datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
+        _refresh_stats['fetched'] += 1
+        return True, "Live rates fetched successfully!"
+
+def refresh_stats():
+    """Count fetch_live_rates() outcomes: fetched, fresh (no fetch needed) and failed"""
+    return dict(_refresh_stats)
+
+# ============================================================
+# BACKGROUND RATE REFRESHER
+# ============================================================
+# Workers never fetch rates on the request path or at import time. The
+# refresher publishes the cached rates immediately, then refreshes them on the
+# RATES_MAX_AGE_HOURS schedule from a daemon thread. Every worker runs one, but
+# fetch_live_rates() re-checks the shared snapshot under the flock, so only
+# the first worker to wake up calls the API; the rest just see its result.
+
+def _seconds_until_refresh():
+    """How long the refresher should sleep before its next attempt"""
+    updated_at = rates_updated_at()
+    if not updated_at:
+        return RATES_RETRY_SECONDS
+    try:
+        remaining = (RATES_MAX_AGE_HOURS - _rates_age_hours(updated_at)) * 3600
+    except ValueError:
+        return RATES_RETRY_SECONDS
+    return max(remaining, RATES_RETRY_SECONDS)
+
+def _refresh_loop(stop_event):
+    while not stop_event.is_set():
+        success, message = fetch_live_rates()
+        print(f"Currency rates: {message}")
+        delay = _seconds_until_refresh() if success else RATES_RETRY_SECONDS
+        stop_event.wait(delay)
+
+def start_rate_refresher():
+    """Publish cached rates now and keep them fresh from a background thread"""
+    global _refresher_pid, _refresher_stop
+    
+    # One refresher per process; a forked worker starts its own
+    if _refresher_pid == os.getpid():
+        return
     
     try:
-        with urllib.request.urlopen(CURRENCY_API_URL, timeout=5) as response:
-            data = json.loads(response.read().decode())
-            
-        if 'rates' in data:
-            new_rates = {
-                'PHP': 1.0,
-                'USD': data['rates'].get('USD', FALLBACK_CONVERSION_RATES['USD']),
-                'GBP': data['rates'].get('GBP', FALLBACK_CONVERSION_RATES['GBP']),
-                'EUR': data['rates'].get('EUR', FALLBACK_CONVERSION_RATES['EUR']),
-                'JPY': data['rates'].get('JPY', FALLBACK_CONVERSION_RATES['JPY']),
-                'AUD': data['rates'].get('AUD', FALLBACK_CONVERSION_RATES['AUD']),
-                'CAD': data['rates'].get('CAD', FALLBACK_CONVERSION_RATES['CAD']),
-                'SGD': data['rates'].get('SGD', FALLBACK_CONVERSION_RATES['SGD']),
-                'HKD': data['rates'].get('HKD', FALLBACK_CONVERSION_RATES['HKD']),
-                'KRW': data['rates'].get('KRW', FALLBACK_CONVERSION_RATES['KRW']),
-            }
-            
-            db.update_currency_rates(new_rates)
-            CONVERSION_RATES = new_rates
-            return True, "Live rates fetched successfully!"
+        # Workers after the first find the shared snapshot already populated
+        if rates_updated_at() is None:
+            load_cached_rates()
     except Exception as e:
-        CONVERSION_RATES = FALLBACK_CONVERSION_RATES.copy()
-        return False, f"API failed, using fallback rates"
+        print(f"Could not load cached rates: {e}")
+    
+    _refresher_pid = os.getpid()
+    _refresher_stop = threading.Event()
+    threading.Thread(target=_refresh_loop, args=(_refresher_stop,),
+                     name='rate-refresher', daemon=True).start()
+
+def stop_rate_refresher():
+    """Stop this process's background refresher"""
+    global _refresher_pid
+    
+    if _refresher_stop is not None:
+        _refresher_stop.set()
+    _refresher_pid = None
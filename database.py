@@ -5,20 +5,180 @@
 # ============================================================
 
 import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
 import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import config
+import report_cache
 
 DATABASE = 'expenses.db'
 
+# Applied once to every new connection. WAL lets readers run alongside the
+# single writer, and NORMAL sync is durable in WAL mode without an fsync per commit.
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-16000',       # ~16 MB page cache per connection
+    'PRAGMA mmap_size=134217728',     # 128 MB memory-mapped reads
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=5000',
+)
+
+# Compiled statements kept per connection (sqlite3's built-in LRU statement cache)
+STATEMENT_CACHE_SIZE = 256
+
+# Class of new connections (slow_queries.py swaps in a timing subclass) and
+# callables run with each one, e.g. instrumentation (see metrics.py). Set
+# both before the first connection is opened.
+CONNECTION_FACTORY = sqlite3.Connection
+CONNECTION_HOOKS = []
+
+# Called as (path, sql, params) to run a single write statement against the
+# database file at path and return its row count once committed; set by
+# group_commit.py to queue writes for its writer thread. None commits each
+# write in its own transaction on the calling thread.
+WRITE_SUBMITTER = None
+
+# Per-tenant sharding, meant for CORPORATE mode. Unset, every user's expenses
+# and budgets live in DATABASE. A number N spreads users over N files by a
+# hash of their user_id; 'tenant' gives each user a file of their own. Shard
+# files are created on first use in SHARD_DIR (default: a directory named
+# after DATABASE, e.g. expenses-shards/). Accounts and currency rates always
+# stay in DATABASE. After changing the setting, move existing data with
+# python database.py rebalance-shards.
+DATABASE_SHARDS = os.environ.get('DATABASE_SHARDS', '')
+SHARD_DIR = os.environ.get('SHARD_DIR', '')
+
+# Connections each thread keeps open; the least recently used beyond this are closed
+MAX_OPEN_CONNECTIONS = int(os.environ.get('SHARD_MAX_OPEN', '16'))
+
+_local = threading.local()
+
+def get_connection(path=None):
+    """Get this thread's reusable connection (opened lazily, one per database file)"""
+    path = path or DATABASE
+    pid = os.getpid()
+    
+    # Connections must never cross a fork (gunicorn --preload) or a thread
+    if getattr(_local, 'pid', None) != pid:
+        _local.pid = pid
+        _local.connections = OrderedDict()
+    
+    conn = _local.connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=5, cached_statements=STATEMENT_CACHE_SIZE,
+                               factory=CONNECTION_FACTORY)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        for hook in CONNECTION_HOOKS:
+            hook(conn)
+        _local.connections[path] = conn
+        _close_idle_connections()
+    else:
+        _local.connections.move_to_end(path)
+    return conn
+
+def _close_idle_connections():
+    """Close this thread's least recently used connections beyond MAX_OPEN_CONNECTIONS"""
+    excess = len(_local.connections) - MAX_OPEN_CONNECTIONS
+    for path, conn in list(_local.connections.items()):
+        if excess <= 0:
+            break
+        # A connection inside a transaction is still in use further up the stack
+        if conn.in_transaction:
+            continue
+        del _local.connections[path]
+        conn.close()
+        excess -= 1
+
+def close_connections():
+    """Close every connection opened by the current thread"""
+    if getattr(_local, 'pid', None) != os.getpid():
+        return
+    for conn in _local.connections.values():
+        conn.close()
+    _local.connections = OrderedDict()
+
+# ============================================================
+# SHARD ROUTING
+# ============================================================
+
+def shard_dir():
+    """Directory holding the shard files"""
+    return SHARD_DIR or os.path.splitext(DATABASE)[0] + '-shards'
+
+def database_path(user_id=None):
+    """Path of the database file holding user_id's expenses and budgets"""
+    if not DATABASE_SHARDS or user_id is None:
+        return DATABASE
+    key = hashlib.sha256(user_id.encode('utf-8')).hexdigest()
+    if DATABASE_SHARDS == 'tenant':
+        name = f'tenant-{key[:16]}.db'
+    else:
+        name = f'shard-{int(key[:8], 16) % int(DATABASE_SHARDS):03d}.db'
+    return os.path.join(shard_dir(), name)
+
+def all_database_paths():
+    """DATABASE followed by every shard file that exists, whatever the current setting"""
+    paths = [DATABASE]
+    directory = shard_dir()
+    if os.path.isdir(directory):
+        paths.extend(os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                     if name.endswith('.db'))
+    return paths
+
+def user_connection(user_id=None):
+    """Get this thread's connection to the file holding user_id's data (DATABASE for None)
+    
+    Shard files are created and brought up to the current schema on first use.
+    """
+    path = database_path(user_id)
+    if path == DATABASE:
+        return get_connection()
+    if path not in _initialized:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _init_shard(get_connection(path), path)
+    return get_connection(path)
+
+def _init_shard(conn, path):
+    """Bring a shard file up to date; a new one gets the full schema but no accounts"""
+    version = get_schema_version(conn)
+    if version < SCHEMA_VERSION:
+        migrate(conn, verbose=False)
+        if version == 0:
+            # Logins are always checked against DATABASE
+            with conn:
+                conn.execute('DELETE FROM users')
+    _initialized.add(path)
+
+@contextmanager
+def read_snapshot(user_id=None):
+    """Run several reads of one user's data against one consistent snapshot (a WAL read transaction)"""
+    conn = user_connection(user_id)
+    conn.execute('BEGIN')
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+
 def hash_password(password):
     """Hash password using SHA256"""
     return hashlib.sha256(password.encode()).hexdigest()
 
-def init_db():
-    """Initialize the database and create tables if they don't exist"""
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    
+# ============================================================
+# SCHEMA MIGRATIONS
+# ============================================================
+# PRAGMA user_version records how many entries of MIGRATIONS have been applied.
+# Each migration runs once, in its own transaction. Append new ones at the end;
+# never edit or reorder a migration that has already shipped.
+
+def _migration_base_schema(cursor):
+    """Base schema: expenses, budget, users and currency_rates"""
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS expenses (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -43,41 +203,29 @@ def init_db():
         )
     ''')
     
-    # Migrate existing tables - add user_id column if it doesn't exist
-    try:
-        # Check if user_id column exists in expenses table
-        cursor.execute("PRAGMA table_info(expenses)")
-        columns = [col[1] for col in cursor.fetchall()]
-        if 'user_id' not in columns:
-            cursor.execute("ALTER TABLE expenses ADD COLUMN user_id TEXT NOT NULL DEFAULT 'default'")
-            conn.commit()
-            print("✓ Added user_id column to expenses table")
-    except Exception as e:
-        print(f"Migration warning (expenses): {e}")
+    # Databases created before multi-user support lack user_id columns
+    cursor.execute("PRAGMA table_info(expenses)")
+    columns = [col[1] for col in cursor.fetchall()]
+    if 'user_id' not in columns:
+        cursor.execute("ALTER TABLE expenses ADD COLUMN user_id TEXT NOT NULL DEFAULT 'default'")
     
-    try:
-        # Check if user_id column exists in budget table
-        cursor.execute("PRAGMA table_info(budget)")
-        columns = [col[1] for col in cursor.fetchall()]
-        if 'user_id' not in columns:
-            # For budget table, we need to recreate it due to UNIQUE constraint change
-            cursor.execute("ALTER TABLE budget RENAME TO budget_old")
-            cursor.execute('''
-                CREATE TABLE budget (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    month TEXT NOT NULL,
-                    amount REAL NOT NULL,
-                    user_id TEXT NOT NULL DEFAULT 'default',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(month, user_id)
-                )
-            ''')
-            cursor.execute("INSERT INTO budget (id, month, amount, user_id, created_at) SELECT id, month, amount, 'default', created_at FROM budget_old")
-            cursor.execute("DROP TABLE budget_old")
-            conn.commit()
-            print("✓ Migrated budget table with user_id column")
-    except Exception as e:
-        print(f"Migration warning (budget): {e}")
+    cursor.execute("PRAGMA table_info(budget)")
+    columns = [col[1] for col in cursor.fetchall()]
+    if 'user_id' not in columns:
+        # For budget table, we need to recreate it due to UNIQUE constraint change
+        cursor.execute("ALTER TABLE budget RENAME TO budget_old")
+        cursor.execute('''
+            CREATE TABLE budget (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                month TEXT NOT NULL,
+                amount REAL NOT NULL,
+                user_id TEXT NOT NULL DEFAULT 'default',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(month, user_id)
+            )
+        ''')
+        cursor.execute("INSERT INTO budget (id, month, amount, user_id, created_at) SELECT id, month, amount, 'default', created_at FROM budget_old")
+        cursor.execute("DROP TABLE budget_old")
     
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -106,238 +254,777 @@ def init_db():
                       ('admin', admin_password, 'admin'))
         cursor.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)', 
                       ('user', user_password, 'user'))
+
+def _migration_expense_indexes(cursor):
+    """Composite indexes for per-user listing and category totals"""
+    # Serves WHERE user_id = ? ORDER BY date DESC, id DESC without a sort step
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_expenses_user_date
+        ON expenses (user_id, date DESC, id DESC)
+    ''')
+    # Covers category filters and GROUP BY category sums without touching the table
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_expenses_user_category
+        ON expenses (user_id, category, amount)
+    ''')
+    cursor.execute('ANALYZE')
+
+def _migration_expense_counts(cursor):
+    """Per-user expense counts maintained by triggers"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS expense_counts (
+            user_id TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS expense_counts_insert AFTER INSERT ON expenses
+        BEGIN
+            INSERT INTO expense_counts (user_id, count) VALUES (NEW.user_id, 1)
+            ON CONFLICT(user_id) DO UPDATE SET count = count + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS expense_counts_delete AFTER DELETE ON expenses
+        BEGIN
+            UPDATE expense_counts SET count = count - 1 WHERE user_id = OLD.user_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS expense_counts_move AFTER UPDATE OF user_id ON expenses
+        WHEN NEW.user_id != OLD.user_id
+        BEGIN
+            UPDATE expense_counts SET count = count - 1 WHERE user_id = OLD.user_id;
+            INSERT INTO expense_counts (user_id, count) VALUES (NEW.user_id, 1)
+            ON CONFLICT(user_id) DO UPDATE SET count = count + 1;
+        END
+    ''')
+    cursor.execute('DELETE FROM expense_counts')
+    cursor.execute('''
+        INSERT INTO expense_counts (user_id, count)
+        SELECT user_id, COUNT(*) FROM expenses GROUP BY user_id
+    ''')
+
+def _migration_expense_search(cursor):
+    """FTS5 full-text index over expense name and category"""
+    try:
+        # Contentless table: rows stay in expenses, the index only stores tokens.
+        # owner holds hex(user_id) as a single token so the per-user filter runs
+        # inside the index instead of joining every user's matches.
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5(
+                name, category, owner,
+                content='', prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5 - search keeps using LIKE
+        print(f"Migration warning (expenses_fts): {e}")
+        return
+    
+    # Rank name hits above category hits; owner never contributes to relevance
+    cursor.execute("INSERT INTO expenses_fts (expenses_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 0.0)')")
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS expenses_fts_insert AFTER INSERT ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (rowid, name, category, owner)
+            VALUES (NEW.id, NEW.name, NEW.category, hex(NEW.user_id));
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS expenses_fts_delete AFTER DELETE ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (expenses_fts, rowid, name, category, owner)
+            VALUES ('delete', OLD.id, OLD.name, OLD.category, hex(OLD.user_id));
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS expenses_fts_update AFTER UPDATE OF name, category, user_id ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (expenses_fts, rowid, name, category, owner)
+            VALUES ('delete', OLD.id, OLD.name, OLD.category, hex(OLD.user_id));
+            INSERT INTO expenses_fts (rowid, name, category, owner)
+            VALUES (NEW.id, NEW.name, NEW.category, hex(NEW.user_id));
+        END
+    ''')
+    cursor.execute('''
+        INSERT INTO expenses_fts (rowid, name, category, owner)
+        SELECT id, name, category, hex(user_id) FROM expenses
+    ''')
+
+def _migration_expense_rollups(cursor):
+    """Monthly per-category rollups maintained by triggers"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS expense_rollups (
+            user_id TEXT NOT NULL,
+            month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total REAL NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, month, category)
+        ) WITHOUT ROWID
+    ''')
+    
+    add_new = '''
+        INSERT INTO expense_rollups (user_id, month, category, total, count)
+        VALUES (NEW.user_id, substr(NEW.date, 1, 7), NEW.category, NEW.amount, 1)
+        ON CONFLICT(user_id, month, category) DO UPDATE
+        SET total = total + excluded.total, count = count + 1;
+    '''
+    remove_old = '''
+        UPDATE expense_rollups SET total = total - OLD.amount, count = count - 1
+        WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7) AND category = OLD.category;
+        DELETE FROM expense_rollups
+        WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7) AND category = OLD.category AND count <= 0;
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS expense_rollups_insert AFTER INSERT ON expenses
+        BEGIN {add_new} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS expense_rollups_delete AFTER DELETE ON expenses
+        BEGIN {remove_old} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS expense_rollups_update
+        AFTER UPDATE OF date, amount, category, user_id ON expenses
+        BEGIN {remove_old} {add_new} END
+    ''')
+    _rebuild_rollups(cursor)
+
+def _migration_data_versions(cursor):
+    """Per-user data version bumped by every expense and budget write"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            user_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    
+    bump = '''
+        INSERT INTO data_versions (user_id, version) VALUES ({row}.user_id, 1)
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+    '''
+    for table in ('expenses', 'budget'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_version_insert AFTER INSERT ON {table}
+            BEGIN {bump.format(row='NEW')} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_version_update AFTER UPDATE ON {table}
+            BEGIN {bump.format(row='OLD')} {bump.format(row='NEW')} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_version_delete AFTER DELETE ON {table}
+            BEGIN {bump.format(row='OLD')} END
+        ''')
+
+def _rebuild_table(cursor, table, create_sql, select_sql):
+    """Replace table with one built by create_sql and filled by select_sql, keeping its indexes and triggers
+    
+    SQLite cannot change a column's type in place. create_sql names the new
+    table {table}; ids and the AUTOINCREMENT counter carry over.
+    """
+    cursor.execute('''
+        SELECT sql FROM sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    ''', (table,))
+    dependents = [row[0] for row in cursor.fetchall()]
+    cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,))
+    sequence = cursor.fetchone()
+    
+    new_table = f'{table}_new'
+    cursor.execute(create_sql.format(table=new_table))
+    cursor.execute(f'INSERT INTO {new_table} {select_sql}')
+    # Dropping a table drops its indexes and triggers without firing them
+    cursor.execute(f'DROP TABLE {table}')
+    # Triggers on other tables may name this one; legacy mode renames without
+    # re-checking them while it is briefly missing
+    cursor.execute('PRAGMA legacy_alter_table=ON')
+    try:
+        cursor.execute(f'ALTER TABLE {new_table} RENAME TO {table}')
+    finally:
+        cursor.execute('PRAGMA legacy_alter_table=OFF')
+    for sql in dependents:
+        cursor.execute(sql)
+    if sequence:
+        cursor.execute('UPDATE sqlite_sequence SET seq = ? WHERE name = ?', (sequence[0], table))
+
+def _migration_integer_amounts(cursor):
+    """Amounts stored as integer centavos"""
+    # SQLite's round() rounds half away from zero, like config.to_minor
+    _rebuild_table(cursor, 'expenses', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            name TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            due_date TEXT,
+            user_id TEXT NOT NULL DEFAULT 'default',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''', '''
+        SELECT id, date, name, CAST(round(amount * 100) AS INTEGER), category, due_date, user_id, created_at
+        FROM expenses
+    ''')
+    _rebuild_table(cursor, 'budget', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            month TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            user_id TEXT NOT NULL DEFAULT 'default',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(month, user_id)
+        )
+    ''', 'SELECT id, month, CAST(round(amount * 100) AS INTEGER), user_id, created_at FROM budget')
+    # Rollup totals are recomputed from the converted rows rather than converted
+    _rebuild_table(cursor, 'expense_rollups', '''
+        CREATE TABLE {table} (
+            user_id TEXT NOT NULL,
+            month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, month, category)
+        ) WITHOUT ROWID
+    ''', 'SELECT * FROM expense_rollups WHERE 0')
+    _rebuild_rollups(cursor)
     
-    conn.commit()
-    conn.close()
+    # Reports cached under the current versions hold REAL totals
+    cursor.execute('UPDATE data_versions SET version = version + 1')
+    cursor.execute('ANALYZE')
+
+MIGRATIONS = [
+    _migration_base_schema,
+    _migration_expense_indexes,
+    _migration_expense_counts,
+    _migration_expense_search,
+    _migration_expense_rollups,
+    _migration_data_versions,
+    _migration_integer_amounts,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(conn=None):
+    """Get the schema version recorded in the database file"""
+    conn = conn or get_connection()
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn=None, target=SCHEMA_VERSION, verbose=True):
+    """Apply pending migrations up to target and return the new schema version"""
+    conn = conn or get_connection()
+    version = get_schema_version(conn)
+    
+    for number in range(version + 1, target + 1):
+        migration = MIGRATIONS[number - 1]
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        # Another worker booting at the same time may have applied it while we waited
+        if get_schema_version(conn) >= number:
+            conn.rollback()
+            version = number
+            continue
+        try:
+            migration(cursor)
+            # PRAGMA does not accept bound parameters; number is always an int
+            cursor.execute(f'PRAGMA user_version = {number}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if verbose:
+            print(f"✓ Schema migration {number}: {migration.__doc__}")
+        version = number
+        _fts_available.clear()
+    
+    return version
+
+# Database files this process has already brought up to date
+_initialized = set()
+
+def init_db():
+    """Bring the database up to date; call once at startup (importing this module does no I/O)
+    
+    An up-to-date database costs one PRAGMA read, and nothing at all on later
+    calls in the same process. Seeding from data.csv only runs when the
+    database file is brand new.
+    """
+    if DATABASE in _initialized:
+        return
+    if DATABASE_SHARDS and DATABASE_SHARDS != 'tenant' and not (DATABASE_SHARDS.isdigit() and int(DATABASE_SHARDS) > 0):
+        raise ValueError(f"DATABASE_SHARDS must be a positive number or 'tenant', not {DATABASE_SHARDS!r}")
+    
+    conn = get_connection()
+    version = get_schema_version(conn)
+    if version < SCHEMA_VERSION:
+        migrate(conn)
+        if version == 0:
+            migrate_from_csv()
+    _initialized.add(DATABASE)
 
 def migrate_from_csv():
     """Migrate existing CSV data to database"""
-    import csv
-    import os
+    import importer
     
     if not os.path.exists('data.csv'):
         return
     
-    conn = sqlite3.connect(DATABASE)
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Check if data already migrated
     cursor.execute('SELECT COUNT(*) FROM expenses')
     if cursor.fetchone()[0] > 0:
-        conn.close()
         return
     
-    try:
-        with open('data.csv', 'r') as f:
-            reader = csv.reader(f)
-            for row in reader:
-                if len(row) >= 4:
-                    date = row[0]
-                    name = row[1]
-                    amount = float(row[2]) if row[2] else 0
-                    category = row[3] if len(row) > 3 else 'Others'
-                    due_date = row[4] if len(row) > 4 else ''
-                    
-                    cursor.execute('''
-                        INSERT INTO expenses (date, name, amount, category, due_date)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (date, name, amount, category, due_date))
-        
-        conn.commit()
-    except Exception as e:
-        pass
-    finally:
-        conn.close()
+    result = importer.import_file('data.csv', 'csv')
+    if result['skipped']:
+        print(f"data.csv: {importer.summarize(result)}")
 
-def get_all_expenses(page=1, per_page=50, search='', category='', user_id='default'):
-    """Get expenses with pagination and filtering"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Build query
-    query = 'SELECT id, date, name, amount, category, due_date FROM expenses WHERE user_id = ?'
-    params = [user_id]
+def encode_cursor(expense):
+    """Build a pagination cursor from an expense row's (date, id) sort key"""
+    return f"{expense['date']}:{expense['id']}"
+
+def decode_cursor(token):
+    """Parse a pagination cursor into (date, id), or None if it is malformed"""
+    date, _, expense_id = (token or '').rpartition(':')
+    if not date or not expense_id.isdigit():
+        return None
+    return date, int(expense_id)
+
+# Whether each database file has the expenses_fts index (FTS5 may be missing)
+_fts_available = {}
+
+def has_search_index(user_id=None):
+    """Check whether the FTS5 search index exists in the file holding user_id's data"""
+    path = database_path(user_id)
+    if path not in _fts_available:
+        cursor = user_connection(user_id).execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'expenses_fts'")
+        _fts_available[path] = cursor.fetchone() is not None
+    return _fts_available[path]
+
+def build_search_query(search, user_id):
+    """Turn free text into an FTS5 query that prefix-matches every word for one user"""
+    words = re.findall(r'\w+', search)
+    if not words:
+        return ''
+    terms = ' '.join(f'"{word}"*' for word in words)
+    # Same encoding as hex(user_id) in the expenses_fts triggers
+    owner = user_id.encode('utf-8').hex().upper()
+    return f'owner : "{owner}" AND {{name category}} : ({terms})'
+
+def _expense_filters(search, category, user_id):
+    """Build the FROM/WHERE clause for a user's expenses, plus whether it is ranked"""
+    match = build_search_query(search, user_id) if search and has_search_index(user_id) else ''
     
-    if search:
-        query += ' AND (name LIKE ? OR category LIKE ?)'
-        params.extend([f'%{search}%', f'%{search}%'])
+    if match:
+        # CROSS JOIN keeps the index lookup as the outer loop. Left to itself the
+        # planner may walk the user's rows and run the MATCH once per row.
+        clause = 'FROM expenses_fts CROSS JOIN expenses e ON e.id = expenses_fts.rowid WHERE expenses_fts MATCH ? AND e.user_id = ?'
+        params = [match, user_id]
+    else:
+        clause = 'FROM expenses e WHERE e.user_id = ?'
+        params = [user_id]
+        if search:
+            clause += ' AND (e.name LIKE ? OR e.category LIKE ?)'
+            params.extend([f'%{search}%', f'%{search}%'])
     
     if category:
-        query += ' AND category = ?'
+        clause += ' AND e.category = ?'
         params.append(category)
     
-    # Get total count
-    count_query = query.replace('SELECT id, date, name, amount, category, due_date', 'SELECT COUNT(*)')
-    cursor.execute(count_query, params)
-    total = cursor.fetchone()[0]
+    return clause, params, bool(match)
+
+def count_expenses(search='', category='', user_id='default'):
+    """Count a user's expenses matching the given filters"""
+    conn = user_connection(user_id)
+    cursor = conn.cursor()
+    
+    if not search and not category:
+        # Unfiltered totals are kept up to date by triggers on expenses
+        cursor.execute('SELECT count FROM expense_counts WHERE user_id = ?', (user_id,))
+        result = cursor.fetchone()
+        return result[0] if result else 0
+    
+    if not search:
+        cursor.execute('SELECT SUM(count) FROM expense_rollups WHERE user_id = ? AND category = ?', (user_id, category))
+        return cursor.fetchone()[0] or 0
+    
+    clause, params, _ = _expense_filters(search, category, user_id)
+    cursor.execute(f'SELECT COUNT(*) {clause}', params)
+    return cursor.fetchone()[0]
+
+def get_all_expenses(page=1, per_page=50, search='', category='', user_id='default', after=None, before=None, rate=1.0):
+    """Get expenses with pagination and filtering
+    
+    Pages are addressed by OFFSET (page) or, for constant-time deep pages, by a
+    keyset cursor: after=<cursor of the last row shown> for the next page,
+    before=<cursor of the first row shown> for the previous one.
+    Searches go through the full-text index and come back ranked by relevance,
+    so they are always paged by OFFSET. Amounts are converted from minor units
+    and multiplied by rate in SQL.
+    """
+    conn = user_connection(user_id)
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    
+    # Build query
+    clause, params, ranked = _expense_filters(search, category, user_id)
+    query = f'SELECT e.id, e.date, e.name, e.amount * ? / ? AS amount, e.category, e.due_date {clause}'
+    params[:0] = [rate, config.MINOR_UNITS]
+    
+    total = count_expenses(search, category, user_id)
     
     # Add pagination
-    query += ' ORDER BY date DESC, id DESC LIMIT ? OFFSET ?'
-    params.extend([per_page, (page - 1) * per_page])
+    after_key = None if ranked else decode_cursor(after)
+    before_key = None if ranked else decode_cursor(before)
+    if ranked:
+        query += ' ORDER BY expenses_fts.rank, e.date DESC, e.id DESC LIMIT ? OFFSET ?'
+        params.extend([per_page, (page - 1) * per_page])
+    elif after_key:
+        query += ' AND (e.date, e.id) < (?, ?) ORDER BY e.date DESC, e.id DESC LIMIT ?'
+        params.extend([*after_key, per_page])
+    elif before_key:
+        # Walk backwards from the first row shown, then restore display order
+        query += ' AND (e.date, e.id) > (?, ?) ORDER BY e.date ASC, e.id ASC LIMIT ?'
+        params.extend([*before_key, per_page])
+    else:
+        query += ' ORDER BY e.date DESC, e.id DESC LIMIT ? OFFSET ?'
+        params.extend([per_page, (page - 1) * per_page])
     
     cursor.execute(query, params)
     expenses = cursor.fetchall()
-    
-    conn.close()
+    if before_key:
+        expenses.reverse()
     
     return expenses, total
 
-def add_expense(date, name, amount, category, due_date='', user_id='default'):
-    """Add new expense"""
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
+def _write(user_id, sql, params):
+    """Run one write statement on user_id's data and commit it, through WRITE_SUBMITTER when set; returns the row count"""
+    conn = user_connection(user_id)
+    if WRITE_SUBMITTER is not None:
+        return WRITE_SUBMITTER(database_path(user_id), sql, params)
     
-    cursor.execute('''
+    with conn:
+        return conn.execute(sql, params).rowcount
+
+def add_expense(date, name, amount, category, due_date='', user_id='default'):
+    """Add new expense (amount in centavos)"""
+    _write(user_id, '''
         INSERT INTO expenses (date, name, amount, category, due_date, user_id)
         VALUES (?, ?, ?, ?, ?, ?)
     ''', (date, name, amount, category, due_date, user_id))
-    
-    conn.commit()
-    conn.close()
 
 def update_expense(expense_id, date, name, amount, category, due_date='', user_id='default'):
-    """Update existing expense"""
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
+    """Update existing expense (amount in centavos)"""
+    _write(user_id, '''
         UPDATE expenses 
         SET date=?, name=?, amount=?, category=?, due_date=?
         WHERE id=? AND user_id=?
     ''', (date, name, amount, category, due_date, expense_id, user_id))
-    
-    conn.commit()
-    conn.close()
 
 def delete_expense(expense_id, user_id='default'):
     """Delete expense"""
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    
-    cursor.execute('DELETE FROM expenses WHERE id=? AND user_id=?', (expense_id, user_id))
-    
-    conn.commit()
-    conn.close()
+    _write(user_id, 'DELETE FROM expenses WHERE id=? AND user_id=?', (expense_id, user_id))
+
 def delete_all_expenses(user_id='default'):
     """Delete all expenses from database for specific user"""
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    
-    cursor.execute('DELETE FROM expenses WHERE user_id=?', (user_id,))
+    conn = user_connection(user_id)
     
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute('DELETE FROM expenses WHERE user_id=?', (user_id,))
+
 def get_expense_by_id(expense_id, user_id='default'):
     """Get single expense by ID"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = user_connection(user_id)
     cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
     
     cursor.execute('SELECT id, date, name, amount, category, due_date FROM expenses WHERE id=? AND user_id=?', (expense_id, user_id))
-    expense = cursor.fetchone()
+    return cursor.fetchone()
+
+# ============================================================
+# BULK INSERTS
+# ============================================================
+# The per-row insert triggers cost several times more than the insert itself.
+# A bulk insert drops them inside its own write transaction, inserts with
+# executemany, then brings each derived table up to date with one set-based
+# statement over the new id range and recreates the triggers before commit.
+# DDL is transactional in SQLite, so other connections never see the schema
+# without its triggers; a rollback restores them along with everything else.
+
+EXPENSE_INSERT_SQL = '''
+    INSERT INTO expenses (date, name, amount, category, due_date, user_id)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+# Insert trigger -> statement doing the same work for every row with id > ?.
+# Triggers not listed here keep firing per row. NOT INDEXED pins the plan to a
+# rowid range seek; otherwise the planner prefers scanning a covering user_id
+# index over the whole table, which makes repeated batches quadratic.
+BULK_TRIGGER_REPLACEMENTS = {
+    'expense_counts_insert': '''
+        INSERT INTO expense_counts (user_id, count)
+        SELECT user_id, COUNT(*) FROM expenses NOT INDEXED WHERE id > ? GROUP BY user_id
+        ON CONFLICT(user_id) DO UPDATE SET count = count + excluded.count
+    ''',
+    'expense_rollups_insert': '''
+        INSERT INTO expense_rollups (user_id, month, category, total, count)
+        SELECT user_id, substr(date, 1, 7), category, SUM(amount), COUNT(*)
+        FROM expenses NOT INDEXED WHERE id > ?
+        GROUP BY user_id, substr(date, 1, 7), category
+        ON CONFLICT(user_id, month, category) DO UPDATE
+        SET total = total + excluded.total, count = count + excluded.count
+    ''',
+    'expenses_fts_insert': '''
+        INSERT INTO expenses_fts (rowid, name, category, owner)
+        SELECT id, name, category, hex(user_id) FROM expenses NOT INDEXED WHERE id > ?
+    ''',
+    'expenses_version_insert': '''
+        INSERT INTO data_versions (user_id, version)
+        SELECT DISTINCT user_id, 1 FROM expenses NOT INDEXED WHERE id > ?
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1
+    ''',
+}
+
+@contextmanager
+def deferred_checkpoints(user_id=None):
+    """Hold off WAL checkpoints on the file holding user_id's data until the block ends
     
-    conn.close()
-    return expense
+    A long import would otherwise checkpoint after nearly every batch commit and
+    copy the same index pages back into the database file again and again.
+    """
+    conn = user_connection(user_id)
+    previous = conn.execute('PRAGMA wal_autocheckpoint').fetchone()[0]
+    conn.execute('PRAGMA wal_autocheckpoint=0')
+    try:
+        yield
+    finally:
+        conn.execute(f'PRAGMA wal_autocheckpoint={previous}')
+        conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
 
-def get_report_data(user_id='default'):
-    """Get aggregated data for reports"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+@contextmanager
+def bulk_insert_expenses(user_id=None):
+    """Open one write transaction and yield insert(rows) for many expenses at once
     
-    # Total
-    cursor.execute('SELECT SUM(amount) FROM expenses WHERE user_id=?', (user_id,))
-    total = cursor.fetchone()[0] or 0
+    rows are (date, name, amount, category, due_date, user_id) tuples with the
+    amount in centavos. Everything inserted inside the block commits together,
+    or not at all if it raises. The transaction is on the file holding user_id's
+    data, so with sharding on every row must belong to user_id.
+    """
+    conn = user_connection(user_id)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # AUTOINCREMENT ids only grow, and we hold the write lock
+        last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM expenses').fetchone()[0]
+        triggers = conn.execute('''
+            SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'expenses'
+        ''').fetchall()
+        suspended = [(name, sql) for name, sql in triggers if name in BULK_TRIGGER_REPLACEMENTS]
+        for name, _ in suspended:
+            conn.execute(f'DROP TRIGGER {name}')
+        
+        yield lambda rows: conn.executemany(EXPENSE_INSERT_SQL, rows).rowcount
+        
+        for name, sql in suspended:
+            conn.execute(BULK_TRIGGER_REPLACEMENTS[name], (last_id,))
+            conn.execute(sql)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+# Columns an update operation may change
+EXPENSE_FIELDS = ('date', 'name', 'amount', 'category', 'due_date')
+
+def apply_expense_operations(operations, user_id='default'):
+    """Apply (op, expense_id, fields) operations in one transaction and return a result per operation
     
-    # Category totals
-    cursor.execute('SELECT category, SUM(amount) FROM expenses WHERE user_id=? GROUP BY category', (user_id,))
-    category_totals = dict(cursor.fetchall())
+    op is 'create', 'update' or 'delete'. Creates report the new id; updates
+    and deletes report whether the id matched one of the user's expenses.
+    """
+    conn = user_connection(user_id)
+    results = []
     
-    # Monthly totals
-    cursor.execute('''
-        SELECT substr(date, 1, 7) as month, SUM(amount) 
-        FROM expenses 
-        WHERE user_id=?
-        GROUP BY month
-    ''', (user_id,))
-    monthly_totals = dict(cursor.fetchall())
+    with conn:
+        for op, expense_id, fields in operations:
+            if op == 'create':
+                cursor = conn.execute(EXPENSE_INSERT_SQL, (fields['date'], fields['name'], fields['amount'],
+                                                           fields['category'], fields['due_date'], user_id))
+                results.append({'id': cursor.lastrowid})
+            elif op == 'update':
+                columns = [column for column in EXPENSE_FIELDS if column in fields]
+                assignments = ', '.join(f'{column}=?' for column in columns)
+                cursor = conn.execute(f'UPDATE expenses SET {assignments} WHERE id=? AND user_id=?',
+                                      [fields[column] for column in columns] + [expense_id, user_id])
+                results.append({'id': expense_id, 'found': cursor.rowcount > 0})
+            elif op == 'delete':
+                cursor = conn.execute('DELETE FROM expenses WHERE id=? AND user_id=?', (expense_id, user_id))
+                results.append({'id': expense_id, 'found': cursor.rowcount > 0})
+            else:
+                raise ValueError(f'unknown operation {op!r}')
+    return results
+
+def _cached(name, user_id, args, compute):
+    """Serve an aggregate from the report cache, recomputing only after the user's data changed"""
+    key = (name, database_path(user_id), user_id, get_data_version(user_id), args)
+    return report_cache.get_or_compute(key, compute)
+
+def get_report_summary(user_id='default'):
+    """Get report totals, category and monthly breakdowns and the row count"""
+    return _cached('report_summary', user_id, (), lambda: _compute_report_summary(user_id))
+
+def _compute_report_summary(user_id):
+    conn = user_connection(user_id)
+    cursor = conn.cursor()
     
-    # All expenses for export
-    cursor.execute('SELECT date, name, amount, category, due_date FROM expenses WHERE user_id=? ORDER BY date DESC', (user_id,))
-    all_expenses = cursor.fetchall()
+    # Aggregates come from the rollups: one row per month and category, not per expense
+    cursor.execute('SELECT month, category, total FROM expense_rollups WHERE user_id=?', (user_id,))
     
-    conn.close()
+    total = 0
+    category_totals = {}
+    monthly_totals = {}
+    for month, category, amount in cursor.fetchall():
+        total += amount
+        category_totals[category] = category_totals.get(category, 0) + amount
+        monthly_totals[month] = monthly_totals.get(month, 0) + amount
     
     return {
         'total': total,
         'category_totals': category_totals,
         'monthly_totals': monthly_totals,
-        'all_expenses': all_expenses
+        'count': count_expenses(user_id=user_id)
     }
 
+def iter_report_expenses(user_id='default', batch_size=500, rate=1.0):
+    """Yield a user's expense rows (date, name, amount, category, due_date), newest first
+    
+    Rows are pulled from the cursor batch_size at a time, so callers that stop
+    early or stream the output never hold the whole history in memory.
+    Amounts are converted from minor units and multiplied by rate in SQL.
+    """
+    conn = user_connection(user_id)
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    
+    try:
+        cursor.execute('''
+            SELECT date, name, amount * ? / ? AS amount, category, due_date FROM expenses
+            WHERE user_id=? ORDER BY date DESC, id DESC
+        ''', (rate, config.MINOR_UNITS, user_id))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+def iter_expense_batches(user_id='default', batch_size=500):
+    """Yield a user's expenses as lists of up to batch_size (date, name, amount, category, due_date) rows
+    
+    Rows come oldest first with amounts in centavos, unconverted, for exports
+    that keep their own types.
+    """
+    conn = user_connection(user_id)
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            SELECT date, name, amount, category, due_date FROM expenses
+            WHERE user_id=? ORDER BY date, id
+        ''', (user_id,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+def get_report_data(user_id='default'):
+    """Get aggregated data for reports together with every expense row, newest first
+    
+    Every amount in the result, totals and rows alike, is in integer centavos;
+    convert with config.from_minor() for display.
+    """
+    # A copy: the summary itself is shared through the report cache
+    data = dict(get_report_summary(user_id))
+    
+    conn = user_connection(user_id)
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    cursor.execute('''
+        SELECT date, name, amount, category, due_date FROM expenses
+        WHERE user_id=? ORDER BY date DESC, id DESC
+    ''', (user_id,))
+    data['all_expenses'] = cursor.fetchall()
+    return data
+
+def get_data_version(user_id='default'):
+    """Get the user's data version; it changes whenever their expenses or budget do"""
+    conn = user_connection(user_id)
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT version FROM data_versions WHERE user_id = ?', (user_id,))
+    result = cursor.fetchone()
+    return result[0] if result else 0
+
 def get_budget(month=None, user_id='default'):
-    """Get budget for specific month (default: current month)"""
+    """Get budget in centavos for specific month (default: current month)"""
     if not month:
         month = datetime.now().strftime('%Y-%m')
     
-    conn = sqlite3.connect(DATABASE)
+    conn = user_connection(user_id)
     cursor = conn.cursor()
     
     cursor.execute('SELECT amount FROM budget WHERE month = ? AND user_id = ?', (month, user_id))
     result = cursor.fetchone()
     
-    conn.close()
     return result[0] if result else 0
 
 def set_budget(amount, month=None, user_id='default'):
-    """Set or update budget for specific month"""
+    """Set or update budget (in centavos) for specific month"""
     if not month:
         month = datetime.now().strftime('%Y-%m')
     
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
+    _write(user_id, '''
         INSERT INTO budget (month, amount, user_id) 
         VALUES (?, ?, ?)
         ON CONFLICT(month, user_id) DO UPDATE SET amount = ?
     ''', (month, amount, user_id, amount))
-    
-    conn.commit()
-    conn.close()
 
 def clear_budget(month=None, user_id='default'):
     """Clear/delete budget for specific month"""
     if not month:
         month = datetime.now().strftime('%Y-%m')
     
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    
-    cursor.execute('DELETE FROM budget WHERE month = ? AND user_id = ?', (month, user_id))
-    
-    conn.commit()
-    conn.close()
+    _write(user_id, 'DELETE FROM budget WHERE month = ? AND user_id = ?', (month, user_id))
 
 def get_budget_status(month=None, user_id='default'):
-    """Get budget status with spent and remaining amounts"""
+    """Get budget status with spent and remaining amounts in centavos"""
     if not month:
         month = datetime.now().strftime('%Y-%m')
     
+    return _cached('budget_status', user_id, (month,), lambda: _compute_budget_status(month, user_id))
+
+def _compute_budget_status(month, user_id):
     budget = get_budget(month, user_id)
     
-    conn = sqlite3.connect(DATABASE)
+    conn = user_connection(user_id)
     cursor = conn.cursor()
     
-    # Get total spent for the month
+    # Get total spent for the month from its rollups: a primary key seek on
+    # (user_id, month) that reads one row per category, not every expense
     cursor.execute('''
-        SELECT SUM(amount) FROM expenses 
-        WHERE substr(date, 1, 7) = ? AND user_id = ?
-    ''', (month, user_id))
+        SELECT SUM(total) FROM expense_rollups
+        WHERE user_id = ? AND month = ?
+    ''', (user_id, month))
     
     spent = cursor.fetchone()[0] or 0
-    conn.close()
     
     remaining = budget - spent
     percentage = (spent / budget * 100) if budget > 0 else 0
@@ -352,7 +1039,7 @@ def get_budget_status(month=None, user_id='default'):
 
 def verify_user(username, password):
     """Verify user credentials and return user info"""
-    conn = sqlite3.connect(DATABASE)
+    conn = get_connection()
     cursor = conn.cursor()
     
     hashed = hash_password(password)
@@ -360,63 +1047,244 @@ def verify_user(username, password):
                   (username, hashed))
     user = cursor.fetchone()
     
-    conn.close()
-    
     if user:
         return {'id': user[0], 'username': user[1], 'role': user[2]}
     return None
 
 def create_user(username, password, role='user'):
     """Create new user"""
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
+    conn = get_connection()
     
     try:
         hashed = hash_password(password)
-        cursor.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)',
-                      (username, hashed, role))
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)',
+                         (username, hashed, role))
         return True
     except:
-        conn.close()
         return False
 
 def update_currency_rates(rates):
     """Update currency rates in database"""
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
+    conn = get_connection()
     
-    for currency, rate in rates.items():
-        cursor.execute('''
+    with conn:
+        conn.executemany('''
             INSERT OR REPLACE INTO currency_rates (currency, rate, updated_at)
             VALUES (?, ?, CURRENT_TIMESTAMP)
-        ''', (currency, rate))
-    
-    conn.commit()
-    conn.close()
+        ''', rates.items())
 
 def get_currency_rates():
     """Get currency rates from database with timestamp"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = get_connection()
     cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
     
     cursor.execute('SELECT currency, rate, updated_at FROM currency_rates')
     rows = cursor.fetchall()
-    conn.close()
     
     if not rows:
         return None, None
     
     rates = {row['currency']: row['rate'] for row in rows}
     # Get the most recent update timestamp
-    cursor = sqlite3.connect(DATABASE).cursor()
-    cursor.execute('SELECT MAX(updated_at) FROM currency_rates')
-    last_update = cursor.fetchone()[0]
+    last_update = max(row['updated_at'] for row in rows)
     
     return rates, last_update
 
-# Initialize database on import
-init_db()
-migrate_from_csv()
+# ============================================================
+# ROLLUP MAINTENANCE
+# ============================================================
+# expense_counts and expense_rollups are derived from expenses by triggers.
+# They only drift if rows were changed with the triggers missing (e.g. a manual
+# import into an older schema), so these are repair tools, not part of requests.
+# Totals are integer centavos, so stored and recomputed totals match exactly.
+
+def _rebuild_rollups(cursor):
+    """Recompute expense_rollups and expense_counts from the expenses table"""
+    cursor.execute('DELETE FROM expense_rollups')
+    cursor.execute('''
+        INSERT INTO expense_rollups (user_id, month, category, total, count)
+        SELECT user_id, substr(date, 1, 7), category, SUM(amount), COUNT(*)
+        FROM expenses
+        GROUP BY user_id, substr(date, 1, 7), category
+    ''')
+    cursor.execute('DELETE FROM expense_counts')
+    cursor.execute('''
+        INSERT INTO expense_counts (user_id, count)
+        SELECT user_id, COUNT(*) FROM expenses GROUP BY user_id
+    ''')
+
+def rebuild_rollups(path=None):
+    """Rebuild all rollup tables of one database file (default: DATABASE) in one transaction"""
+    conn = get_connection(path)
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        _rebuild_rollups(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def verify_rollups(path=None):
+    """Compare rollups against the expenses table of one database file and return every mismatch"""
+    conn = get_connection(path)
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    
+    cursor.execute('''
+        WITH actual AS (
+            SELECT user_id, substr(date, 1, 7) AS month, category, SUM(amount) AS total, COUNT(*) AS count
+            FROM expenses
+            GROUP BY user_id, substr(date, 1, 7), category
+        )
+        SELECT a.user_id, a.month, a.category,
+               r.total AS stored_total, a.total AS actual_total,
+               r.count AS stored_count, a.count AS actual_count
+        FROM actual a
+        LEFT JOIN expense_rollups r USING (user_id, month, category)
+        WHERE r.count IS NULL OR r.count != a.count OR r.total != a.total
+        UNION ALL
+        SELECT r.user_id, r.month, r.category, r.total, 0, r.count, 0
+        FROM expense_rollups r
+        LEFT JOIN actual a USING (user_id, month, category)
+        WHERE a.count IS NULL
+    ''')
+    mismatches = [dict(row) for row in cursor.fetchall()]
+    
+    cursor.execute('''
+        SELECT c.user_id, c.count AS stored_count, COUNT(e.id) AS actual_count
+        FROM expense_counts c
+        LEFT JOIN expenses e ON e.user_id = c.user_id
+        GROUP BY c.user_id
+        HAVING stored_count != actual_count
+        UNION ALL
+        SELECT e.user_id, 0, COUNT(*)
+        FROM expenses e
+        WHERE NOT EXISTS (SELECT 1 FROM expense_counts c WHERE c.user_id = e.user_id)
+        GROUP BY e.user_id
+    ''')
+    mismatches.extend(dict(row) for row in cursor.fetchall())
+    
+    return mismatches
+
+# ============================================================
+# SHARD REBALANCING
+# ============================================================
+# Moves users whose data sits in a different file from the one database_path()
+# assigns them: after turning sharding on (everything starts in DATABASE),
+# changing the shard count, switching to per-tenant files, or turning it off
+# again. Stop the app and change DATABASE_SHARDS first; each user then moves
+# in one transaction over both files (ATTACH), so readers never see them
+# half-moved. Expense ids are renumbered in the target file.
+
+def _move_user(source, target, user_id):
+    """Move one user's expenses, budgets and data version from source to target; returns the expenses moved"""
+    user_connection(user_id)    # creates and migrates target if needed
+    conn = get_connection(source)
+    conn.execute('ATTACH DATABASE ? AS target', (target,))
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            moved = conn.execute('''
+                INSERT INTO target.expenses (date, name, amount, category, due_date, user_id, created_at)
+                SELECT date, name, amount, category, due_date, user_id, created_at
+                FROM main.expenses WHERE user_id = ? ORDER BY id
+            ''', (user_id,)).rowcount
+            # Budgets already set in the target were written after the switch, so they win
+            conn.execute('''
+                INSERT INTO target.budget (month, amount, user_id, created_at)
+                SELECT month, amount, user_id, created_at FROM main.budget WHERE user_id = ?
+                ON CONFLICT(month, user_id) DO NOTHING
+            ''', (user_id,))
+            # Carry the version over so report caches keyed by it cannot be reused
+            conn.execute('''
+                INSERT INTO target.data_versions (user_id, version)
+                SELECT user_id, version FROM main.data_versions WHERE user_id = ?
+                ON CONFLICT(user_id) DO UPDATE SET version = version + excluded.version
+            ''', (user_id,))
+            conn.execute('DELETE FROM main.expenses WHERE user_id = ?', (user_id,))
+            conn.execute('DELETE FROM main.budget WHERE user_id = ?', (user_id,))
+            conn.execute('DELETE FROM main.expense_counts WHERE user_id = ?', (user_id,))
+            conn.execute('DELETE FROM main.data_versions WHERE user_id = ?', (user_id,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute('DETACH DATABASE target')
+    return moved
+
+def rebalance_shards(dry_run=False, progress=None):
+    """Move every user into the file the current sharding setting assigns them
+    
+    Returns (user_id, source, target, expenses) for each user moved (or, with
+    dry_run, each user that would move). progress, if given, is called with
+    the same tuple after each move.
+    """
+    moves = []
+    for source in all_database_paths():
+        if source != DATABASE and source not in _initialized:
+            _init_shard(get_connection(source), source)
+        conn = get_connection(source)
+        users = [row[0] for row in conn.execute('SELECT user_id FROM expenses UNION SELECT user_id FROM budget')]
+        for user_id in users:
+            target = database_path(user_id)
+            if os.path.abspath(target) == os.path.abspath(source):
+                continue
+            if dry_run:
+                count = conn.execute('SELECT COUNT(*) FROM expenses WHERE user_id = ?', (user_id,)).fetchone()[0]
+            else:
+                count = _move_user(source, target, user_id)
+            moves.append((user_id, source, target, count))
+            if progress:
+                progress(*moves[-1])
+    return moves
+
+def main(argv=None):
+    """Command-line setup and maintenance: python database.py [verify-rollups [--repair] | rebuild-rollups | rebalance-shards [--dry-run]]"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Expense Tracker database maintenance')
+    commands = parser.add_subparsers(dest='command')
+    verify = commands.add_parser('verify-rollups', help='check rollup tables against expenses')
+    verify.add_argument('--repair', action='store_true', help='rebuild the rollups if any drift is found')
+    commands.add_parser('rebuild-rollups', help='recompute rollup tables from expenses')
+    rebalance = commands.add_parser('rebalance-shards', help='move users into the files DATABASE_SHARDS assigns them')
+    rebalance.add_argument('--dry-run', action='store_true', help='only list the users that would move')
+    args = parser.parse_args(argv)
+    
+    init_db()
+    if args.command is None:
+        print(f"✓ Database ready (schema version {get_schema_version()})")
+    
+    if args.command == 'verify-rollups':
+        drifted = 0
+        for path in all_database_paths():
+            mismatches = verify_rollups(path)
+            for row in mismatches:
+                print(f"✗ Drift in {path}: {row}")
+            if mismatches and args.repair:
+                rebuild_rollups(path)
+                print(f"✓ Rebuilt rollups in {path} ({len(mismatches)} mismatches repaired)")
+            drifted += len(mismatches)
+        if not drifted:
+            print("✓ Rollups match the expenses table")
+        return 1 if drifted and not args.repair else 0
+    
+    if args.command == 'rebuild-rollups':
+        for path in all_database_paths():
+            rebuild_rollups(path)
+        print("✓ Rebuilt rollups")
+    
+    if args.command == 'rebalance-shards':
+        verb = 'Would move' if args.dry_run else 'Moved'
+        moves = rebalance_shards(args.dry_run, lambda user_id, source, target, count:
+                                 print(f"  {verb} {user_id}: {count:,} expenses, {source} -> {target}"))
+        print(f"✓ {verb} {len(moves)} users" if moves else "✓ Every user is already in the right file")
+    
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,140 @@
+# ============================================================
+# GROUP COMMIT - Expense Tracker
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+# Optional single-writer pipeline for the small writes the routes make
+# (add/update/delete an expense, set/clear a budget). Set GROUP_COMMIT_MS to
+# a coalescing window in milliseconds to turn it on; unset, every write opens
+# and commits its own transaction as before.
+#
+# When it is on, each write is queued to one writer thread per process. The
+# writer waits up to GROUP_COMMIT_MS after the first write for more to arrive,
+# then applies the whole batch in a single BEGIN IMMEDIATE ... COMMIT, so the
+# request threads of a worker wait for SQLite's write lock and commit once per
+# batch instead of once per expense, and never race each other for the lock.
+# Callers still block until their write is committed and get its row count
+# (or its exception) back. Under gunicorn each worker has its own writer.
+#
+# Each write runs inside its own SAVEPOINT, so one failing statement is rolled
+# back and reported to its caller without affecting the rest of the batch.
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import database as db
+
+GROUP_COMMIT_MS = float(os.environ.get('GROUP_COMMIT_MS', '0'))
+
+# Most writes applied in one transaction
+GROUP_COMMIT_MAX_BATCH = 500
+
+_queue = None
+_writer_pid = None
+_start_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'writes': 0, 'failed': 0, 'commits': 0, 'largest_batch': 0}
+
+def enabled():
+    return GROUP_COMMIT_MS > 0
+
+def _writer_queue():
+    """This process's write queue, starting the writer thread on first use (and after a fork)"""
+    global _queue, _writer_pid
+    pid = os.getpid()
+    if _writer_pid != pid:
+        with _start_lock:
+            if _writer_pid != pid:
+                _queue = queue.SimpleQueue()
+                threading.Thread(target=_run, args=(_queue,), name='group-commit-writer', daemon=True).start()
+                _writer_pid = pid
+    return _queue
+
+def submit(path, sql, params):
+    """Queue one write statement on the database file at path and wait until it is committed; returns its row count"""
+    future = Future()
+    _writer_queue().put((path, sql, params, future))
+    return future.result()
+
+def _collect(pending):
+    """Block for the next write, then gather more until the window closes or the batch is full"""
+    batch = [pending.get()]
+    deadline = time.monotonic() + GROUP_COMMIT_MS / 1000
+    while len(batch) < GROUP_COMMIT_MAX_BATCH:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(pending.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+def _commit(path, writes):
+    """Apply writes to the database at path in one transaction and resolve their futures"""
+    conn = db.get_connection(path)
+    outcomes = []
+    committed = 0
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        for _, sql, params, future in writes:
+            conn.execute('SAVEPOINT group_write')
+            try:
+                rowcount = conn.execute(sql, params).rowcount
+            except Exception as e:
+                conn.execute('ROLLBACK TO group_write')
+                outcomes.append((future, None, e))
+            else:
+                outcomes.append((future, rowcount, None))
+            conn.execute('RELEASE group_write')
+        conn.commit()
+        committed = 1
+    except Exception as e:
+        # Nothing in the batch was committed (e.g. the lock wait timed out)
+        if conn.in_transaction:
+            conn.rollback()
+        outcomes = [(future, None, e) for _, _, _, future in writes]
+    
+    failed = 0
+    for future, rowcount, error in outcomes:
+        if error is None:
+            future.set_result(rowcount)
+        else:
+            failed += 1
+            future.set_exception(error)
+    with _stats_lock:
+        _stats['writes'] += len(writes)
+        _stats['failed'] += failed
+        _stats['commits'] += committed
+        _stats['largest_batch'] = max(_stats['largest_batch'], len(writes))
+
+def _run(pending):
+    while True:
+        batch = _collect(pending)
+        # One transaction per database file (several when sharding is on)
+        by_path = {}
+        for write in batch:
+            by_path.setdefault(write[0], []).append(write)
+        for path, writes in by_path.items():
+            try:
+                _commit(path, writes)
+            except Exception as e:
+                print(f"Group commit writer error: {e}")
+                for _, _, _, future in writes:
+                    if not future.done():
+                        future.set_exception(e)
+
+def stats():
+    """Writes, failed writes, commits and the largest batch so far in this process"""
+    with _stats_lock:
+        result = dict(_stats)
+    result['queued'] = _queue.qsize() if _queue is not None and _writer_pid == os.getpid() else 0
+    return result
+
+def install():
+    """Route database.py's single-row writes through the writer, if GROUP_COMMIT_MS is set"""
+    if enabled():
+        db.WRITE_SUBMITTER = submit
@@ -0,0 +1,225 @@
+# ============================================================
+# BULK IMPORT - Expense Tracker
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+# Streams expenses from CSV or JSON lines and inserts them in batches, each
+# batch one executemany transaction (database.bulk_insert_expenses). Bad rows
+# are skipped and reported by line number; with atomic=True the first bad row
+# aborts the whole import instead and nothing is written.
+#
+# CSV:  date,name,amount,category[,due_date]   (an optional header row names the columns)
+# JSON: one object per line with the same keys
+#
+# Usage: python importer.py FILE [--user default] [--format csv|jsonl] [--atomic]
+
+import argparse
+import csv
+import io
+import json
+import math
+import re
+import sys
+import time
+
+import config
+import database as db
+
+IMPORT_BATCH_SIZE = 10000
+
+# Errors beyond this many are counted but not listed
+MAX_REPORTED_ERRORS = 100
+
+FIELDS = ('date', 'name', 'amount', 'category', 'due_date')
+JSON_EXTENSIONS = ('.jsonl', '.ndjson', '.json')
+
+_DATE_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})$')
+
+class AtomicImportAborted(Exception):
+    """Raised inside the import transaction to roll an atomic import back"""
+
+def detect_format(filename):
+    """Guess 'csv' or 'jsonl' from a file name"""
+    return 'jsonl' if filename.lower().endswith(JSON_EXTENSIONS) else 'csv'
+
+def parse_csv(lines):
+    """Yield (line number, record dict) for each non-blank CSV row"""
+    reader = csv.reader(lines)
+    fields = FIELDS
+    for row in reader:
+        if not ''.join(row).strip():
+            continue
+        if reader.line_num == 1 and row[0].strip().lower() == 'date':
+            fields = tuple(cell.strip().lower() for cell in row)
+            continue
+        yield reader.line_num, dict(zip(fields, row))
+
+def parse_jsonl(lines):
+    """Yield (line number, record) for each non-blank JSON line"""
+    for line_num, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_num, json.loads(line)
+        except ValueError as e:
+            yield line_num, e
+
+def _valid_date(value, required=True):
+    """Return value if it is a YYYY-MM-DD date (or blank and optional), else raise ValueError"""
+    value = str(value or '').strip()
+    if not value and not required:
+        return ''
+    match = _DATE_RE.match(value)
+    if not match or not (1 <= int(match.group(2)) <= 12 and 1 <= int(match.group(3)) <= 31):
+        raise ValueError(f'invalid date {value!r} (expected YYYY-MM-DD)')
+    return value
+
+def _valid_name(value):
+    name = str(value or '').strip()
+    if not name:
+        raise ValueError('missing name')
+    return name
+
+def _valid_amount(value):
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid amount {value!r}")
+    if not math.isfinite(amount):
+        raise ValueError(f"invalid amount {value!r}")
+    return amount
+
+def clean_record(record, to_base=1.0, partial=False):
+    """Validate an expense record and return its cleaned fields; raise ValueError if it is bad
+
+    With partial=True only the fields present are checked (for updates).
+    Amounts are multiplied by to_base to bring them into the base currency and
+    stored as integer centavos.
+    """
+    if isinstance(record, Exception):
+        raise ValueError(f'invalid JSON: {record}')
+    if not isinstance(record, dict):
+        raise ValueError('expected an object with date, name, amount and category')
+    
+    fields = {}
+    if not partial or 'date' in record:
+        fields['date'] = _valid_date(record.get('date'))
+    if not partial or 'name' in record:
+        fields['name'] = _valid_name(record.get('name'))
+    if not partial or 'amount' in record:
+        fields['amount'] = config.to_minor(_valid_amount(record.get('amount')) * to_base)
+    if not partial or 'category' in record:
+        fields['category'] = str(record.get('category') or '').strip() or 'Others'
+    if not partial or 'due_date' in record:
+        fields['due_date'] = _valid_date(record.get('due_date'), required=False)
+    return fields
+
+def to_row(record, user_id, to_base=1.0):
+    """Validate one record and build its insert tuple; raise ValueError if it is bad"""
+    fields = clean_record(record, to_base)
+    return (fields['date'], fields['name'], fields['amount'], fields['category'], fields['due_date'], user_id)
+
+def import_records(records, user_id='default', to_base=1.0, batch_size=IMPORT_BATCH_SIZE,
+                   atomic=False, progress=None):
+    """Import (line number, record) pairs; return a summary dict
+    
+    to_base converts the file's amounts into the base currency (PHP).
+    progress(imported, skipped) is called after every batch.
+    """
+    result = {'imported': 0, 'skipped': 0, 'errors': [], 'rolled_back': False}
+    
+    def batches():
+        batch = []
+        for line_num, record in records:
+            try:
+                batch.append(to_row(record, user_id, to_base))
+            except ValueError as e:
+                result['skipped'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append((line_num, str(e)))
+                if atomic:
+                    raise AtomicImportAborted()
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    try:
+        with db.deferred_checkpoints(user_id):
+            if atomic:
+                # One transaction around everything: the first bad row rolls it all back
+                with db.bulk_insert_expenses(user_id) as insert:
+                    for batch in batches():
+                        result['imported'] += insert(batch)
+                        if progress:
+                            progress(result['imported'], result['skipped'])
+            else:
+                for batch in batches():
+                    with db.bulk_insert_expenses(user_id) as insert:
+                        result['imported'] += insert(batch)
+                    if progress:
+                        progress(result['imported'], result['skipped'])
+    except AtomicImportAborted:
+        result['imported'] = 0
+        result['rolled_back'] = True
+    
+    return result
+
+def import_stream(lines, fmt='csv', **kwargs):
+    """Import from an iterable of text lines in 'csv' or 'jsonl' format"""
+    parse = parse_jsonl if fmt == 'jsonl' else parse_csv
+    return import_records(parse(lines), **kwargs)
+
+def import_file(path, fmt=None, **kwargs):
+    """Import a CSV or JSON lines file from disk"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return import_stream(f, fmt or detect_format(path), **kwargs)
+
+def import_upload(file_storage, **kwargs):
+    """Import an uploaded file (werkzeug FileStorage) without reading it all into memory"""
+    fmt = detect_format(file_storage.filename or '')
+    lines = io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', newline='')
+    return import_stream(lines, fmt, **kwargs)
+
+def summarize(result):
+    """One-line human readable summary of an import result"""
+    if result['rolled_back']:
+        line_num, error = result['errors'][0]
+        return f"Nothing imported: line {line_num}: {error}"
+    
+    message = f"Imported {result['imported']:,} expenses"
+    if result['skipped']:
+        line_num, error = result['errors'][0]
+        message += f", skipped {result['skipped']:,} invalid rows (first error on line {line_num}: {error})"
+    return message
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk import expenses from CSV or JSON lines')
+    parser.add_argument('file')
+    parser.add_argument('--user', default='default', help='user_id the expenses belong to')
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help='default: guessed from the file name')
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument('--atomic', action='store_true', help='import nothing if any row is invalid')
+    args = parser.parse_args(argv)
+    
+    db.init_db()
+    start = time.perf_counter()
+    
+    def progress(imported, skipped):
+        rate = imported / max(time.perf_counter() - start, 1e-9)
+        print(f"\r{imported:,} imported, {skipped:,} skipped ({rate:,.0f} rows/s)", end='', file=sys.stderr)
+    
+    result = import_file(args.file, args.format, user_id=args.user, batch_size=args.batch_size,
+                         atomic=args.atomic, progress=progress)
+    print(file=sys.stderr)
+    
+    for line_num, error in result['errors']:
+        print(f"line {line_num}: {error}", file=sys.stderr)
+    if result['skipped'] > len(result['errors']):
+        print(f"... and {result['skipped'] - len(result['errors']):,} more errors", file=sys.stderr)
+    print(f"{summarize(result)} in {time.perf_counter() - start:.1f}s")
+    return 1 if result['skipped'] else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,258 @@
+# ============================================================
+# METRICS - Expense Tracker
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+# Opt-in instrumentation, served in Prometheus text format on /metrics.
+# Set METRICS_ENABLED=1 to turn it on. When it is off, install() hooks nothing
+# and adds no route, so requests run exactly the code they run without it.
+#
+# Recorded per process (under gunicorn, each worker counts its own requests):
+#   - latency of every request, by route, method and status
+#   - SQL statements run and connections opened per request
+#   - time spent in each public database.py function (inclusive of the
+#     database.py functions it calls)
+#   - report cache hits/misses/evictions and currency refresh outcomes
+#   - group commit writes, commits and queue depth (when GROUP_COMMIT_MS is set)
+
+import functools
+import inspect
+import os
+import threading
+import time
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '') == '1'
+
+PREFIX = 'expensetracker_'
+
+# Histogram name -> (help text, label names, bucket upper bounds)
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        'Time to build the response (streamed bodies excluded)', ('route', 'method', 'status'),
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)),
+    'http_request_sql_statements': (
+        'SQL statements run while serving a request', ('route',),
+        (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)),
+    'http_request_db_connections': (
+        'SQLite connections opened while serving a request', ('route',),
+        (0, 1, 2, 4)),
+    'db_function_duration_seconds': (
+        'Time spent in database.py functions', ('function',),
+        (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)),
+}
+
+# Counter name -> help text (label-less, incremented from connection hooks)
+COUNTERS = {
+    'sql_statements_total': 'SQL statements run, including background threads',
+    'db_connections_opened_total': 'SQLite connections opened',
+}
+
+# database.py functions left unwrapped: called for every query, so their
+# cost is better seen through the connection counters
+UNTIMED_DB_FUNCTIONS = {'get_connection', 'close_connections', 'user_connection', 'database_path', 'shard_dir'}
+
+_lock = threading.Lock()
+_histograms = {name: {} for name in HISTOGRAMS}     # name -> {labels: [bucket counts..., sum, count]}
+_counters = dict.fromkeys(COUNTERS, 0)
+_local = threading.local()      # per-request statement and connection counts
+_installed = False
+
+def observe(name, labels, value):
+    """Record one value in a histogram; labels is a tuple matching its label names"""
+    buckets = HISTOGRAMS[name][2]
+    with _lock:
+        series = _histograms[name].get(labels)
+        if series is None:
+            series = _histograms[name][labels] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+def _count(name):
+    with _lock:
+        _counters[name] += 1
+
+# ============================================================
+# HOOKS
+# ============================================================
+
+def _trace_statement(sql):
+    # Statements run by triggers are reported as "-- TRIGGER ..." comments
+    if sql.startswith('--'):
+        return
+    _count('sql_statements_total')
+    _local.statements = getattr(_local, 'statements', 0) + 1
+
+def _instrument_connection(conn):
+    """database.CONNECTION_HOOKS entry: count the connection and every statement it runs"""
+    _count('db_connections_opened_total')
+    _local.connections = getattr(_local, 'connections', 0) + 1
+    conn.set_trace_callback(_trace_statement)
+
+def _timed(name, func):
+    """Wrap a database.py function so its duration is recorded"""
+    labels = (name,)
+    
+    if inspect.isgeneratorfunction(func):
+        # Only time spent producing rows counts, not the caller's work between them
+        @functools.wraps(func)
+        def timed_generator(*args, **kwargs):
+            rows = func(*args, **kwargs)
+            elapsed = 0.0
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        row = next(rows)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    yield row
+            finally:
+                rows.close()
+                observe('db_function_duration_seconds', labels, elapsed)
+        return timed_generator
+    
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            observe('db_function_duration_seconds', labels, time.perf_counter() - start)
+    return timed
+
+def _instrument_database(db):
+    """Wrap every public function of database.py in place"""
+    for name, func in list(vars(db).items()):
+        if name.startswith('_') or name in UNTIMED_DB_FUNCTIONS:
+            continue
+        if not inspect.isfunction(func) or func.__module__ != db.__name__:
+            continue
+        # Context managers (already wrapped by @contextmanager) time their caller's block
+        if hasattr(func, '__wrapped__'):
+            continue
+        setattr(db, name, _timed(name, func))
+    db.CONNECTION_HOOKS.append(_instrument_connection)
+
+def _request_route(request):
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def install(app):
+    """Instrument app and database.py and add the /metrics route, if METRICS_ENABLED
+    
+    Call before the first database connection is opened so every connection
+    is counted.
+    """
+    global _installed
+    
+    if not METRICS_ENABLED or _installed:
+        return
+    _installed = True
+    
+    from flask import Response, g, request
+    import database as db
+    
+    _instrument_database(db)
+    
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        _local.statements = 0
+        _local.connections = 0
+    
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+    
+    @app.teardown_request
+    def record_request(exc):
+        start = g.pop('metrics_start', None)
+        route = _request_route(request)
+        if start is None or route == '/metrics':
+            return
+        status = str(g.pop('metrics_status', 500))
+        observe('http_request_duration_seconds', (route, request.method, status), time.perf_counter() - start)
+        observe('http_request_sql_statements', (route,), getattr(_local, 'statements', 0))
+        observe('http_request_db_connections', (route,), getattr(_local, 'connections', 0))
+    
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+# ============================================================
+# EXPOSITION
+# ============================================================
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_bound(bound):
+    return f'{bound:g}' if isinstance(bound, float) else str(bound)
+
+def _metric(lines, name, kind, help_text, samples):
+    """Append one metric family; samples are (suffix, labels, value)"""
+    lines.append(f'# HELP {PREFIX}{name} {help_text}')
+    lines.append(f'# TYPE {PREFIX}{name} {kind}')
+    for suffix, labels, value in samples:
+        lines.append(f'{PREFIX}{name}{suffix}{labels} {value:g}' if isinstance(value, float)
+                     else f'{PREFIX}{name}{suffix}{labels} {value}')
+
+def render():
+    """Current metrics in Prometheus text exposition format"""
+    import config
+    import group_commit
+    import report_cache
+    
+    lines = []
+    with _lock:
+        histograms = {name: {labels: list(series) for labels, series in data.items()}
+                      for name, data in _histograms.items()}
+        counters = dict(_counters)
+    
+    for name, (help_text, label_names, buckets) in HISTOGRAMS.items():
+        samples = []
+        for labels, series in sorted(histograms[name].items()):
+            for bound, count in zip(buckets, series):
+                samples.append(('_bucket', _labels(label_names, labels, [('le', _format_bound(bound))]), count))
+            samples.append(('_bucket', _labels(label_names, labels, [('le', '+Inf')]), series[-1]))
+            samples.append(('_sum', _labels(label_names, labels), float(series[-2])))
+            samples.append(('_count', _labels(label_names, labels), series[-1]))
+        _metric(lines, name, 'histogram', help_text, samples)
+    
+    for name, help_text in COUNTERS.items():
+        _metric(lines, name, 'counter', help_text, [('', '', counters[name])])
+    
+    cache = report_cache.stats()
+    for field in ('hits', 'misses', 'evictions'):
+        _metric(lines, f'report_cache_{field}_total', 'counter', f'Report cache {field}', [('', '', cache[field])])
+    _metric(lines, 'report_cache_entries', 'gauge', 'Entries in the report cache', [('', '', cache['entries'])])
+    _metric(lines, 'report_cache_bytes', 'gauge', 'Estimated size of the report cache', [('', '', cache['bytes'])])
+    
+    _metric(lines, 'rate_refreshes_total', 'counter', 'Currency rate refresh attempts by outcome',
+            [('', _labels(('result',), (result,)), count) for result, count in sorted(config.refresh_stats().items())])
+    age = config.rates_age_seconds()
+    if age is not None:
+        _metric(lines, 'rates_age_seconds', 'gauge', 'Age of the currency rates in use', [('', '', float(age))])
+    
+    if group_commit.enabled():
+        writer = group_commit.stats()
+        _metric(lines, 'group_commit_writes_total', 'counter', 'Writes applied by the group commit writer',
+                [('', _labels(('result',), (result,)), count)
+                 for result, count in (('ok', writer['writes'] - writer['failed']), ('failed', writer['failed']))])
+        _metric(lines, 'group_commit_commits_total', 'counter', 'Transactions committed by the group commit writer',
+                [('', '', writer['commits'])])
+        _metric(lines, 'group_commit_largest_batch', 'gauge', 'Most writes committed together so far',
+                [('', '', writer['largest_batch'])])
+        _metric(lines, 'group_commit_queued', 'gauge', 'Writes waiting for the writer', [('', '', writer['queued'])])
+    
+    return '\n'.join(lines) + '\n'
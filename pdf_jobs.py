@@ -0,0 +1,184 @@
+# ============================================================
+# BACKGROUND PDF JOBS - Expense Tracker
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+# PDF reports are rendered by a local process pool, off the request thread.
+# Finished files are cached on disk under a job id that hashes everything the
+# report depends on (user, currency, rate, data version, month). Any gunicorn
+# worker can therefore answer status requests and serve the cached file, and
+# unchanged data is never rendered twice. No external broker is needed.
+#
+# Files in PDF_CACHE_DIR, per job:
+#   <job_id>.pending   marker while a render is queued or running
+#   <job_id>.pdf       the finished report
+#   <job_id>.err       error message if the render failed
+
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import database as db
+
+PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR', 'pdf_cache')
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', '2'))
+
+# A pending marker older than this belongs to a render that died with its worker
+PDF_JOB_TIMEOUT = 300
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def _user_key(user_id):
+    """Short, non-reversible prefix identifying a user's cache files"""
+    return hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:16]
+
+def job_id_for(user_id, currency, conversion_rate, data_version, month, full=False):
+    """Build the job id (and cache key) for a report with the given inputs
+    
+    Ids look like <user>-<kind>-v<data version>-<inputs>, kind being 'report'
+    or 'statement' (full history), so each kind keeps its own cached file and
+    files for outdated data can be told apart from other currencies or months.
+    """
+    inputs = f'{currency}|{conversion_rate!r}|{data_version}|{month}'
+    kind = 'statement' if full else 'report'
+    return f'{_user_key(user_id)}-{kind}-v{data_version}-{hashlib.sha256(inputs.encode("utf-8")).hexdigest()[:16]}'
+
+def _data_version(job_id):
+    """Data version embedded in a job id, or None if it has none"""
+    parts = job_id.split('-')
+    if len(parts) == 4 and parts[2][:1] == 'v' and parts[2][1:].isdigit():
+        return int(parts[2][1:])
+    return None
+
+def is_statement(job_id):
+    """Whether a job renders the full-history statement"""
+    return '-statement-' in job_id
+
+def owns_job(user_id, job_id):
+    """Check that a job id belongs to the given user"""
+    return job_id.startswith(_user_key(user_id) + '-')
+
+def _job_file(job_id, suffix, cache_dir=None):
+    return os.path.join(cache_dir or PDF_CACHE_DIR, job_id + suffix)
+
+def result_path(job_id):
+    """Absolute path of a job's finished PDF"""
+    return os.path.abspath(_job_file(job_id, '.pdf'))
+
+def get_status(job_id):
+    """Get a job's status: 'done', 'failed', 'pending' or 'unknown'"""
+    if os.path.exists(_job_file(job_id, '.pdf')):
+        return 'done'
+    if os.path.exists(_job_file(job_id, '.err')):
+        return 'failed'
+    try:
+        age = time.time() - os.path.getmtime(_job_file(job_id, '.pending'))
+    except OSError:
+        return 'unknown'
+    return 'pending' if age < PDF_JOB_TIMEOUT else 'unknown'
+
+def get_error(job_id):
+    """Get the error message of a failed job"""
+    try:
+        with open(_job_file(job_id, '.err'), encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+def _get_executor():
+    """Get this process's render pool, creating it on first use"""
+    global _executor, _executor_pid
+    
+    with _executor_lock:
+        # A forked gunicorn worker must not reuse its parent's pool
+        if _executor is None or _executor_pid != os.getpid():
+            # spawn: render processes never inherit the worker's threads or connections
+            _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+            _executor_pid = os.getpid()
+        return _executor
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+def submit(job_id, user_id, currency, currency_symbol, conversion_rate):
+    """Queue a render unless the PDF is cached or already rendering; return the job status"""
+    status = get_status(job_id)
+    if status in ('done', 'pending'):
+        return status
+    
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    marker = _job_file(job_id, '.pending')
+    try:
+        # O_EXCL: when several workers race on the same job, only one queues it
+        os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        if get_status(job_id) == 'pending':
+            return 'pending'
+        # Stale marker left by a dead worker - take the job over
+        os.utime(marker)
+    
+    # Retrying a failed job clears its old error
+    if os.path.exists(_job_file(job_id, '.err')):
+        os.remove(_job_file(job_id, '.err'))
+    
+    args = (db.DATABASE, PDF_CACHE_DIR, job_id, user_id, currency, currency_symbol, conversion_rate,
+            is_statement(job_id))
+    try:
+        _get_executor().submit(_run_job, *args)
+    except BrokenProcessPool:
+        _reset_executor()
+        _get_executor().submit(_run_job, *args)
+    return 'pending'
+
+def _prune_user_cache(cache_dir, job_id):
+    """Delete the user's PDFs of the same kind rendered from older data versions
+    
+    PDFs of the current version in other currencies or months are kept.
+    """
+    version = _data_version(job_id)
+    prefix = job_id.split('-v', 1)[0] + '-'
+    for filename in os.listdir(cache_dir):
+        if not (filename.startswith(prefix) and filename.endswith('.pdf')):
+            continue
+        # Ids without a version predate it in the id and are always older
+        other = _data_version(filename[:-len('.pdf')])
+        if other is None or other < version:
+            try:
+                os.remove(os.path.join(cache_dir, filename))
+            except OSError:
+                pass
+
+def _run_job(database, cache_dir, job_id, user_id, currency, currency_symbol, conversion_rate, full):
+    """Render one report inside a pool process"""
+    import pdf_report
+    
+    db.DATABASE = database
+    final_path = _job_file(job_id, '.pdf', cache_dir)
+    # Write under a temporary name so readers never see a half-written PDF
+    tmp_path = f'{final_path}.{os.getpid()}.tmp'
+    try:
+        pdf_report.render_report_pdf(tmp_path, user_id, currency, currency_symbol, conversion_rate, full)
+        os.replace(tmp_path, final_path)
+        _prune_user_cache(cache_dir, job_id)
+    except Exception as e:
+        print(f"Error generating PDF: {e}")
+        traceback.print_exc()
+        with open(_job_file(job_id, '.err', cache_dir), 'w', encoding='utf-8') as f:
+            f.write(str(e))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    finally:
+        try:
+            os.remove(_job_file(job_id, '.pending', cache_dir))
+        except OSError:
+            pass
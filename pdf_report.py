@@ -0,0 +1,308 @@
+# ============================================================
+# PDF REPORT RENDERING - Expense Tracker
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+# Builds the PDF report for one user. Runs inside the pdf_jobs worker
+# processes, so it reads everything it needs from the database and its
+# arguments - never from the Flask request or session.
+#
+# The regular report lists the 50 most recent expenses. A full statement
+# (full=True) lists every expense: the rows are streamed from the database
+# cursor one page at a time and drawn straight onto the canvas, so memory
+# stays flat and render time grows linearly with the history.
+
+import itertools
+import sys
+from datetime import datetime
+
+import config
+import database as db
+
+def _ensure_pil():
+    """Workaround for PIL DLL issues - mock PIL if it fails to load"""
+    try:
+        from PIL import Image
+    except (ImportError, OSError) as pil_error:
+        # Create a mock PIL module to allow reportlab to import
+        print(f"PIL import failed: {pil_error}, using mock")
+        from unittest.mock import MagicMock
+        sys.modules['PIL'] = MagicMock()
+        sys.modules['PIL.Image'] = MagicMock()
+
+_ensure_pil()
+
+# Import reportlab components
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Flowable
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.enums import TA_CENTER
+
+# Expense detail layout, shared by the regular table and the streamed statement
+DETAIL_COLUMNS = ('Date', 'Name', 'Amount', 'Category')
+DETAIL_COL_WIDTHS = (1.2*inch, 2.3*inch, 1.2*inch, 1.3*inch)
+STATEMENT_ROW_HEIGHT = 14
+STATEMENT_FONT_SIZE = 9
+
+def _detail_cells(e, currency_symbol):
+    return (e['date'], e['name'][:30], f'{currency_symbol}{e["amount"]:.2f}', e['category'])
+
+class StatementChunk(Flowable):
+    """One page worth of expense rows, drawn with plain canvas calls"""
+    
+    def __init__(self, rows, currency_symbol):
+        super().__init__()
+        self.rows = rows
+        self.currency_symbol = currency_symbol
+        self.width = sum(DETAIL_COL_WIDTHS)
+        self.height = (len(rows) + 1) * STATEMENT_ROW_HEIGHT
+    
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+    
+    def draw(self):
+        canv = self.canv
+        row_height = STATEMENT_ROW_HEIGHT
+        top = self.height
+        
+        # Header band and body background, like the regular details table
+        canv.setFillColor(colors.HexColor('#667eea'))
+        canv.rect(0, top - row_height, self.width, row_height, stroke=0, fill=1)
+        canv.setFillColor(colors.beige)
+        canv.rect(0, 0, self.width, top - row_height, stroke=0, fill=1)
+        
+        # Grid
+        canv.setStrokeColor(colors.grey)
+        canv.setLineWidth(0.5)
+        x_positions = list(itertools.accumulate(DETAIL_COL_WIDTHS, initial=0))
+        for x in x_positions:
+            canv.line(x, 0, x, top)
+        for i in range(len(self.rows) + 2):
+            canv.line(0, i * row_height, self.width, i * row_height)
+        
+        # Header text
+        baseline = top - row_height + 4
+        canv.setFillColor(colors.whitesmoke)
+        canv.setFont('Helvetica-Bold', STATEMENT_FONT_SIZE)
+        for x, label in zip(x_positions, DETAIL_COLUMNS):
+            canv.drawString(x + 6, baseline, label)
+        
+        # One text object per column keeps the content stream (and the work) small
+        canv.setFillColor(colors.black)
+        cells = [_detail_cells(e, self.currency_symbol) for e in self.rows]
+        for x, column in zip(x_positions, zip(*cells)):
+            text = canv.beginText(x + 6, baseline - row_height)
+            text.setFont('Helvetica', STATEMENT_FONT_SIZE, leading=row_height)
+            for cell in column:
+                text.textLine(cell)
+            canv.drawText(text)
+
+class StatementRows(Flowable):
+    """Every remaining expense row, pulled from a cursor one page at a time
+    
+    It never fits, so platypus asks it to split on every page. Each split takes
+    only the rows that fit in the space left and returns them as a
+    StatementChunk followed by a new StatementRows for the rest.
+    """
+    
+    def __init__(self, rows, currency_symbol):
+        super().__init__()
+        self.rows = iter(rows)
+        self.currency_symbol = currency_symbol
+        # One row of look-ahead tells us when the last chunk has been taken
+        self.head = next(self.rows, None)
+    
+    def wrap(self, availWidth, availHeight):
+        if self.head is None:
+            return 0, 0
+        return sum(DETAIL_COL_WIDTHS), availHeight + 1
+    
+    def split(self, availWidth, availHeight):
+        count = int(availHeight // STATEMENT_ROW_HEIGHT) - 1
+        if self.head is None or count < 1:
+            return []
+        chunk = [self.head]
+        chunk.extend(itertools.islice(self.rows, count - 1))
+        
+        # A fresh flowable for the rest: platypus marks flowables it had to
+        # postpone, and a reused one would carry that mark to later pages
+        rest = StatementRows(self.rows, self.currency_symbol)
+        if rest.head is None:
+            return [StatementChunk(chunk, self.currency_symbol)]
+        return [StatementChunk(chunk, self.currency_symbol), rest]
+    
+    def draw(self):
+        pass
+
+def _draw_page_number(canv, doc):
+    canv.saveState()
+    canv.setFont('Helvetica', 8)
+    canv.setFillColor(colors.grey)
+    canv.drawRightString(doc.pagesize[0] - doc.rightMargin, 20, f'Page {doc.page}')
+    canv.restoreState()
+
+def render_report_pdf(path, user_id, currency, currency_symbol, conversion_rate, full=False):
+    """Render the expense report (or with full=True, the complete statement) into the PDF at path
+    
+    Returns the number of pages written.
+    """
+    # One read snapshot, so the totals always match the rows listed
+    with db.read_snapshot(user_id):
+        return _render(path, user_id, currency, currency_symbol, conversion_rate, full)
+
+def _render(path, user_id, currency, currency_symbol, conversion_rate, full):
+    # Get report data
+    report_data = db.get_report_summary(user_id)
+    
+    # Convert amounts for current currency
+    total = config.from_minor(report_data['total']) * conversion_rate
+    category_totals = config.convert_totals(report_data['category_totals'], conversion_rate)
+    monthly_totals = config.convert_totals(report_data['monthly_totals'], conversion_rate)
+    
+    # Expense rows arrive converted; the regular report only needs the 50 most recent
+    expenses = db.iter_report_expenses(user_id, rate=conversion_rate)
+    if not full:
+        expenses = list(itertools.islice(expenses, 50))
+    
+    # Get budget status
+    budget_status = config.convert_budget_status(db.get_budget_status(user_id=user_id), conversion_rate)
+    
+    # Create PDF
+    # Full statements keep room at the bottom for page numbers
+    doc = SimpleDocTemplate(path, pagesize=letter, rightMargin=72, leftMargin=72,
+                          topMargin=72, bottomMargin=36 if full else 18)
+    
+    # Container for elements
+    elements = []
+    styles = getSampleStyleSheet()
+    
+    # Custom styles
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#667eea'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#764ba2'),
+        spaceAfter=12,
+    )
+    
+    # Title
+    elements.append(Paragraph("Expense Tracker Report", title_style))
+    elements.append(Paragraph(f"Generated: {datetime.now().strftime('%B %d, %Y %I:%M %p')}", styles['Normal']))
+    elements.append(Paragraph(f"Currency: {currency_symbol} {currency}", styles['Normal']))
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Summary Section
+    elements.append(Paragraph("Summary", heading_style))
+    summary_data = [
+        ['Total Expenses:', f'{currency_symbol}{total:.2f}'],
+        ['Total Transactions:', str(report_data['count'])],
+        ['Categories:', str(len(category_totals))],
+    ]
+    
+    if budget_status:
+        summary_data.extend([
+            ['Monthly Budget:', f'{currency_symbol}{budget_status["budget"]:.2f}'],
+            ['Budget Used:', f'{budget_status["percentage"]:.1f}%'],
+            ['Remaining:', f'{currency_symbol}{budget_status["remaining"]:.2f}'],
+        ])
+    
+    summary_table = Table(summary_data, colWidths=[3*inch, 3*inch])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f8f9fa')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ]))
+    elements.append(summary_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Category Breakdown
+    elements.append(Paragraph("Category Breakdown", heading_style))
+    category_data = [['Category', 'Amount', 'Percentage']]
+    for category, amount in sorted(category_totals.items(), key=lambda x: x[1], reverse=True):
+        percentage = (amount / total * 100) if total > 0 else 0
+        category_data.append([category, f'{currency_symbol}{amount:.2f}', f'{percentage:.1f}%'])
+    
+    category_table = Table(category_data, colWidths=[2*inch, 2*inch, 2*inch])
+    category_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    elements.append(category_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Monthly Breakdown
+    elements.append(Paragraph("Monthly Breakdown", heading_style))
+    monthly_data = [['Month', 'Amount']]
+    for month in sorted(monthly_totals.keys(), reverse=True):
+        monthly_data.append([month, f'{currency_symbol}{monthly_totals[month]:.2f}'])
+    
+    monthly_table = Table(monthly_data, colWidths=[3*inch, 3*inch])
+    monthly_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#764ba2')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    elements.append(monthly_table)
+    elements.append(PageBreak())
+    
+    # Expense Details
+    if full:
+        elements.append(Paragraph(f"Expense Details ({report_data['count']} transactions)", heading_style))
+        elements.append(StatementRows(expenses, currency_symbol))
+    else:
+        elements.append(Paragraph("Expense Details", heading_style))
+        expense_data = [list(DETAIL_COLUMNS)]
+        for e in expenses:  # Limited to the 50 most recent above
+            expense_data.append(list(_detail_cells(e, currency_symbol)))
+        
+        expense_table = Table(expense_data, colWidths=list(DETAIL_COL_WIDTHS))
+        expense_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ]))
+        elements.append(expense_table)
+    
+    # Footer
+    elements.append(Spacer(1, 0.5*inch))
+    elements.append(Paragraph("© 2026 Expense Tracker | Developed by ESC", 
+                             ParagraphStyle('Footer', parent=styles['Normal'], 
+                                          fontSize=9, textColor=colors.grey, alignment=TA_CENTER)))
+    
+    # Build PDF
+    if full:
+        doc.build(elements, onFirstPage=_draw_page_number, onLaterPages=_draw_page_number)
+    else:
+        doc.build(elements)
+    return doc.page
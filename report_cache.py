@@ -0,0 +1,77 @@
+# ============================================================
+# REPORT CACHE - Expense Tracker
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+# In-process LRU cache for per-user aggregates (report summary, budget status).
+# database.py keys every entry by the user's data version, which triggers bump
+# on each expense or budget write. A write therefore invalidates that user's
+# entries in every gunicorn worker with no explicit purge, and unchanged data
+# is never aggregated twice. Stale versions simply age out of the LRU.
+
+import copy
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+REPORT_CACHE_MAX_ENTRIES = int(os.environ.get('REPORT_CACHE_MAX_ENTRIES', '2048'))
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+
+_entries = OrderedDict()    # key -> (value, size in bytes), least recently used first
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes': 0}
+
+def estimate_size(value):
+    """Rough memory footprint of a cached value in bytes"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+def get_or_compute(key, compute):
+    """Return the cached value for key, calling compute() on a miss
+
+    Callers get their own copy, so mutating the result (as the routes do when
+    converting currencies) never leaks back into the cache.
+    """
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            _stats['hits'] += 1
+            return copy.deepcopy(entry[0])
+        _stats['misses'] += 1
+
+    # Compute outside the lock; two threads racing on one key both compute once
+    value = compute()
+    size = estimate_size(value)
+    if size > REPORT_CACHE_MAX_BYTES:
+        return value
+
+    with _lock:
+        previous = _entries.pop(key, None)
+        if previous is not None:
+            _stats['bytes'] -= previous[1]
+        _entries[key] = (copy.deepcopy(value), size)
+        _stats['bytes'] += size
+
+        while len(_entries) > REPORT_CACHE_MAX_ENTRIES or _stats['bytes'] > REPORT_CACHE_MAX_BYTES:
+            _, (_, evicted_size) = _entries.popitem(last=False)
+            _stats['bytes'] -= evicted_size
+            _stats['evictions'] += 1
+
+    return value
+
+def clear():
+    """Drop every cached entry (counters are kept)"""
+    with _lock:
+        _entries.clear()
+        _stats['bytes'] = 0
+
+def stats():
+    """Get hit/miss/eviction counters and current size"""
+    with _lock:
+        return dict(_stats, entries=len(_entries))
@@ -0,0 +1,129 @@
+# ============================================================
+# SHARED RATES SNAPSHOT - Expense Tracker
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+# A small memory-mapped file that all gunicorn workers on a host map at once.
+# It holds the current currency rates plus a version number that goes up on
+# every publish. Readers never lock: they compare the version with the one
+# they last saw and only re-read the rates when it changed, using a sequence
+# counter (seqlock) to detect and retry a read that overlapped a write.
+# Writers are serialized with an flock on a sidecar .lock file, held only for
+# the write itself. Refreshes (an API call of up to several seconds) take a
+# second flock on .refresh.lock, so a slow fetch never holds up a worker
+# opening the file or another process publishing.
+#
+# Layout (little endian):
+#   magic  4s   b'EXRT'
+#   layout I    crc32 of the currency list, so a changed list re-initializes the file
+#   seq    Q    odd while a write is in progress
+#   version Q   0 = never published
+#   updated_at 32s  'YYYY-MM-DD HH:MM:SS' (UTC), NUL padded
+#   rates  N*d  one double per currency, in currency-list order
+
+import mmap
+import os
+import struct
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:     # Windows: no flock, so no cross-process sharing
+    fcntl = None
+
+MAGIC = b'EXRT'
+_HEADER = struct.Struct('<4sIQQ32s')
+_SEQ_OFFSET = 8
+_VERSION_OFFSET = 16
+_READ_RETRIES = 100
+
+def is_supported():
+    """Whether this platform can share the snapshot between processes"""
+    return fcntl is not None
+
+class SharedRates:
+    """Handle on the shared snapshot file for one process"""
+    
+    def __init__(self, path, currencies):
+        self.path = path
+        self.currencies = tuple(currencies)
+        self._rates = struct.Struct(f'<{len(self.currencies)}d')
+        self._layout = zlib.crc32(','.join(self.currencies).encode('utf-8'))
+        self._size = _HEADER.size + self._rates.size
+        
+        self._lock_fd = os.open(path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        self._refresh_fd = os.open(path + '.refresh.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            with self.lock():
+                magic, layout = self._read_file_header(fd)
+                if magic != MAGIC or layout != self._layout:
+                    # New, truncated or written for a different currency list
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, self._size)
+                    os.pwrite(fd, _HEADER.pack(MAGIC, self._layout, 0, 0, b''), 0)
+            self._map = mmap.mmap(fd, self._size)
+        finally:
+            os.close(fd)
+    
+    def _read_file_header(self, fd):
+        data = os.pread(fd, _HEADER.size, 0)
+        if len(data) < _HEADER.size or os.fstat(fd).st_size != self._size:
+            return None, None
+        magic, layout, _, _, _ = _HEADER.unpack(data)
+        return magic, layout
+    
+    @contextmanager
+    def lock(self):
+        """Hold the cross-process writer lock"""
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+    
+    @contextmanager
+    def refresh_lock(self):
+        """Hold the cross-process refresh lock, so one process at a time calls the API"""
+        fcntl.flock(self._refresh_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._refresh_fd, fcntl.LOCK_UN)
+    
+    def version(self):
+        """Current snapshot version - the only thing the hot path reads"""
+        return struct.unpack_from('<Q', self._map, _VERSION_OFFSET)[0]
+    
+    def read(self):
+        """Read (version, rates, updated_at) consistently, or None if never published"""
+        for _ in range(_READ_RETRIES):
+            seq = struct.unpack_from('<Q', self._map, _SEQ_OFFSET)[0]
+            if seq & 1:
+                continue
+            _, _, _, version, updated_at = _HEADER.unpack_from(self._map, 0)
+            values = self._rates.unpack_from(self._map, _HEADER.size)
+            if struct.unpack_from('<Q', self._map, _SEQ_OFFSET)[0] == seq:
+                if version == 0:
+                    return None
+                rates = dict(zip(self.currencies, values))
+                return version, rates, updated_at.rstrip(b'\0').decode('ascii') or None
+        return None
+    
+    def write(self, rates, updated_at):
+        """Publish new rates and return the new version (caller holds lock())"""
+        seq = struct.unpack_from('<Q', self._map, _SEQ_OFFSET)[0]
+        version = self.version() + 1
+        values = [float(rates[currency]) for currency in self.currencies]
+        
+        struct.pack_into('<Q', self._map, _SEQ_OFFSET, seq + 1)
+        _HEADER.pack_into(self._map, 0, MAGIC, self._layout, seq + 1, version,
+                          (updated_at or '').encode('ascii'))
+        self._rates.pack_into(self._map, _HEADER.size, *values)
+        struct.pack_into('<Q', self._map, _SEQ_OFFSET, seq + 2)
+        return version
+    
+    def close(self):
+        self._map.close()
+        os.close(self._lock_fd)
@@ -0,0 +1,236 @@
+# ============================================================
+# SLOW-QUERY LOG - Expense Tracker
+# Author: Edward Colon (ESC)
+# Copyright (c) 2026
+# ============================================================
+# Opt-in recorder for slow SQL statements. Set SLOW_QUERY_MS to a threshold in
+# milliseconds to turn it on. New connections then use TimedConnection, which
+# times every statement: execute() plus the fetches that read its rows.
+# Statements over the threshold are printed and aggregated by normalized SQL
+# (literals and IN lists collapsed), each with the shape of its parameters
+# (types, never values) and its latest EXPLAIN QUERY PLAN.
+# Unset, database.py keeps plain sqlite3 connections and nothing is timed.
+#
+# Results are per process; read them from /admin/slow_queries.
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '0'))
+
+# Recent slow statements kept for the admin route, and distinct statements tracked
+SLOW_QUERY_RECENT = 100
+SLOW_QUERY_MAX_STATEMENTS = 500
+
+# Statements EXPLAIN QUERY PLAN can describe
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+_lock = threading.Lock()
+_statements = {}     # normalized sql -> aggregate
+_recent = deque(maxlen=SLOW_QUERY_RECENT)
+
+def enabled():
+    return SLOW_QUERY_MS > 0
+
+def normalize(sql):
+    """Collapse whitespace, literals and IN lists so variants of one statement group together"""
+    sql = _LITERALS.sub('?', ' '.join(sql.split()))
+    return _IN_LISTS.sub('(?, ...)', sql)
+
+def param_shape(params):
+    """Describe parameters by type only (values may be personal data)"""
+    if isinstance(params, dict):
+        return {name: type(value).__name__ for name, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+def explain(conn, sql, params):
+    """EXPLAIN QUERY PLAN rows for a statement as indented text, or None if it has no plan"""
+    if not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    try:
+        # A plain cursor, so the EXPLAIN itself is not timed
+        rows = conn.cursor(sqlite3.Cursor).execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+    except sqlite3.Error as e:
+        return f'(no plan: {e})'
+    depth = {0: 0}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, 0) + 1
+        lines.append('  ' * (depth[node] - 1) + detail)
+    return '\n'.join(lines)
+
+def _current_route():
+    """The Flask route being served, if any"""
+    flask = sys.modules.get('flask')
+    if flask is None or not flask.has_request_context():
+        return None
+    rule = flask.request.url_rule
+    return rule.rule if rule else flask.request.path
+
+def record(conn, sql, params, seconds, rows=None):
+    """Log and aggregate a statement that ran for seconds, if that is over the threshold"""
+    ms = seconds * 1000
+    if ms < SLOW_QUERY_MS:
+        return
+    
+    normalized = normalize(sql)
+    shape = param_shape(params)
+    if rows is not None:
+        shape = {'rows': rows, 'first': shape}
+    plan = explain(conn, sql, params)
+    event = {
+        'sql': normalized,
+        'ms': round(ms, 3),
+        'params': shape,
+        'route': _current_route(),
+        'at': datetime.now().isoformat(timespec='seconds'),
+        'plan': plan,
+    }
+    print(f"Slow query ({ms:.1f} ms): {normalized} params={shape}")
+    
+    with _lock:
+        _recent.append(event)
+        stats = _statements.get(normalized)
+        if stats is None:
+            if len(_statements) >= SLOW_QUERY_MAX_STATEMENTS:
+                return
+            stats = _statements[normalized] = {'sql': normalized, 'count': 0, 'total_ms': 0.0,
+                                               'max_ms': 0.0, 'param_shapes': [], 'routes': []}
+        stats['count'] += 1
+        stats['total_ms'] += ms
+        stats['max_ms'] = max(stats['max_ms'], ms)
+        stats['last_at'] = event['at']
+        stats['plan'] = plan
+        if shape not in stats['param_shapes'] and len(stats['param_shapes']) < 10:
+            stats['param_shapes'].append(shape)
+        if event['route'] and event['route'] not in stats['routes']:
+            stats['routes'].append(event['route'])
+
+def report():
+    """Aggregated slow statements (slowest total first) and the most recent events"""
+    with _lock:
+        statements = sorted((dict(stats) for stats in _statements.values()),
+                            key=lambda stats: stats['total_ms'], reverse=True)
+        recent = list(_recent)
+    for stats in statements:
+        stats['total_ms'] = round(stats['total_ms'], 3)
+        stats['max_ms'] = round(stats['max_ms'], 3)
+        stats['mean_ms'] = round(stats['total_ms'] / stats['count'], 3)
+    return {'threshold_ms': SLOW_QUERY_MS, 'statements': statements, 'recent': recent[::-1]}
+
+def reset():
+    """Forget everything recorded so far"""
+    with _lock:
+        _statements.clear()
+        _recent.clear()
+
+# ============================================================
+# TIMED CONNECTIONS
+# ============================================================
+# sqlite3 does most of a SELECT's work while rows are fetched, not in
+# execute(), so a cursor adds up both and records the statement once its
+# rows are exhausted, or when it runs another statement, closes or is freed.
+
+class TimedCursor(sqlite3.Cursor):
+    _sql = None
+    
+    def _finish(self):
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            try:
+                record(self.connection, sql, self._params, self._elapsed)
+            except sqlite3.Error:
+                pass
+    
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._elapsed += time.perf_counter() - start
+    
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        self._sql, self._params, self._elapsed = sql, parameters, time.perf_counter() - start
+        # Nothing left to fetch (writes, DDL, PRAGMA assignments)
+        if self.description is None:
+            self._finish()
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        if isinstance(seq_of_parameters, (list, tuple)):
+            first, rows = (seq_of_parameters[0] if seq_of_parameters else ()), len(seq_of_parameters)
+        else:
+            first, rows = (), 'iterator'
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        elapsed = time.perf_counter() - start
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            record(self.connection, sql, first, elapsed, rows)
+        return self
+    
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        return row
+    
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if not rows:
+            self._finish()
+        return rows
+    
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._finish()
+        return rows
+    
+    def __next__(self):
+        try:
+            return self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+    
+    def close(self):
+        self._finish()
+        super().close()
+    
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            # Freed on another thread or after its connection closed
+            pass
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def install():
+    """Make database.py open timed connections, if SLOW_QUERY_MS is set
+    
+    Call before the first database connection is opened.
+    """
+    if enabled():
+        import database as db
+        db.CONNECTION_FACTORY = TimedConnection